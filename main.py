@@ -1,41 +1,72 @@
 import asyncio
+import atexit
 import logging
+import logging.handlers
+import queue
+import orjson
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.config import settings
 from src.matching_engine.engine import MatchingEngine
 from src.api.order_api import router as order_router
-from src.api.market_data_api import router as market_data_router, broadcast_market_data_update, broadcast_trade_execution
+from src.api.market_data_api import router as market_data_router, ConnectionManager
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('matching_engine.log'),
-        logging.StreamHandler()
-    ]
+try:
+    import uvloop  # noqa: F401
+    EVENT_LOOP = "uvloop"
+except ImportError:
+    # uvloop has no Windows build; fall back to the stdlib loop
+    EVENT_LOOP = "asyncio"
+
+# Configure logging: the event loop only enqueues records, while a
+# background listener thread does the formatting and the file and console writes.
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records as-is so message formatting happens on the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_file_handler = logging.FileHandler(settings.LOG_FILE)
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+
+_log_queue = queue.SimpleQueue()
+_root_logger = logging.getLogger()
+_root_logger.setLevel(settings.LOG_LEVEL)
+_root_logger.addHandler(_DeferredQueueHandler(_log_queue))
+log_listener = logging.handlers.QueueListener(
+    _log_queue, _file_handler, _stream_handler, respect_handler_level=True
 )
+log_listener.start()
+# The listener lives as long as the process, across any number of app lifespans
+atexit.register(log_listener.stop)
 
 logger = logging.getLogger(__name__)
 
-# Global matching engine instance
-matching_engine = None
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
-    global matching_engine
-    
     # Startup
     logger.info("Starting GoQuant Matching Engine...")
+    logger.info("Event loop: %s (%s)", type(asyncio.get_running_loop()).__name__, EVENT_LOOP)
     matching_engine = MatchingEngine()
+    await matching_engine.initialize()
+    connection_manager = ConnectionManager()
     
     # Add callbacks for real-time data streaming
-    matching_engine.add_trade_callback(broadcast_trade_execution)
-    matching_engine.add_market_data_callback(broadcast_market_data_update)
+    matching_engine.add_trade_callback(connection_manager.broadcast_trades)
+    matching_engine.add_market_data_callback(connection_manager.broadcast_market_data)
+    
+    # One engine and one connection manager per process, shared via app state
+    app.state.matching_engine = matching_engine
+    app.state.connection_manager = connection_manager
+    # The symbol list is fixed for the process lifetime, so encode it once
+    app.state.symbols_json = orjson.dumps(matching_engine.get_supported_symbols())
     
     logger.info("Matching engine started successfully")
     
@@ -43,8 +74,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down GoQuant Matching Engine...")
-    if matching_engine:
-        await matching_engine.shutdown()
+    await matching_engine.shutdown()
+    await connection_manager.close()
     logger.info("Matching engine shutdown complete")
 
 # Create FastAPI application
@@ -52,6 +83,7 @@ app = FastAPI(
     title="GoQuant Matching Engine",
     description="High-performance cryptocurrency matching engine with REG NMS compliance",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -81,33 +113,34 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    global matching_engine
+    matching_engine = getattr(app.state, "matching_engine", None)
     
     if matching_engine is None:
         return {"status": "unhealthy", "message": "Matching engine not initialized"}
     
-    try:
-        # Get basic engine statistics
-        stats = await matching_engine.get_statistics()
-        return {
-            "status": "healthy",
-            "engine_status": "running",
-            "supported_symbols": list(matching_engine.order_books.keys()),
-            "active_orders": stats.get("total_orders", 0)
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return {"status": "unhealthy", "message": str(e)}
-
-# Make matching engine available to API endpoints
-app.state.matching_engine = matching_engine
+    # Plain attribute reads only: load balancers poll this endpoint constantly
+    return {
+        "status": "healthy",
+        "engine_status": "running" if matching_engine.running else "stopped",
+        "supported_symbols": settings.SUPPORTED_SYMBOLS,
+        "active_orders": matching_engine.open_order_count
+    }
 
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug,
-        log_level="info"
+        host=settings.HOST,
+        port=settings.PORT,
+        loop=EVENT_LOOP,
+        http="httptools",
+        ws="websockets",
+        ws_ping_interval=settings.WS_PING_INTERVAL,
+        ws_ping_timeout=settings.WS_PING_TIMEOUT,
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE,
+        reload=settings.DEBUG,  # reload is for development only
+        access_log=False,  # no per-request access log line on the order path
+        log_level="warning",
+        server_header=False,
+        date_header=False
     )
@@ -9,66 +9,63 @@ import sys
 import argparse
 from pathlib import Path
 
-def run_unit_tests():
+def _run_pytest(args: list, quiet: bool = False) -> subprocess.CompletedProcess:
+    """Run pytest, streaming its output unless quiet is set."""
+    cmd = [sys.executable, "-m", "pytest", *args]
+    if quiet:
+        return subprocess.run(cmd, check=False, capture_output=True, text=True)
+    return subprocess.run(cmd, check=False)
+
+def _report_failure(result: subprocess.CompletedProcess) -> None:
+    """Print captured output of a failed quiet run."""
+    if result.stdout is not None:
+        print("STDOUT:", result.stdout)
+        print("STDERR:", result.stderr)
+
+def run_unit_tests(quiet: bool = False):
     """Run unit tests."""
     print("Running unit tests...")
-    try:
-        result = subprocess.run([
-            sys.executable, "-m", "pytest", "tests/test_matching_engine.py", "-v"
-        ], check=True, capture_output=True, text=True)
+    result = _run_pytest(["tests/test_matching_engine.py", "-v"], quiet)
+    if result.returncode == 0:
         print("✓ Unit tests passed")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Unit tests failed: {e}")
-        print("STDOUT:", e.stdout)
-        print("STDERR:", e.stderr)
-        return False
+    print(f"✗ Unit tests failed (exit code {result.returncode})")
+    _report_failure(result)
+    return False
 
-def run_benchmark_tests():
+def run_benchmark_tests(quiet: bool = False):
     """Run benchmark tests."""
     print("Running benchmark tests...")
-    try:
-        result = subprocess.run([
-            sys.executable, "-m", "pytest", "tests/benchmark/", "-v", "--benchmark-only"
-        ], check=True, capture_output=True, text=True)
+    result = _run_pytest(["tests/benchmark/", "-v", "--benchmark-only"], quiet)
+    if result.returncode == 0:
         print("✓ Benchmark tests passed")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Benchmark tests failed: {e}")
-        print("STDOUT:", e.stdout)
-        print("STDERR:", e.stderr)
-        return False
+    print(f"✗ Benchmark tests failed (exit code {result.returncode})")
+    _report_failure(result)
+    return False
 
-def run_all_tests():
+def run_all_tests(quiet: bool = False):
     """Run all tests."""
     print("Running all tests...")
-    try:
-        result = subprocess.run([
-            sys.executable, "-m", "pytest", "tests/", "-v"
-        ], check=True, capture_output=True, text=True)
+    result = _run_pytest(["tests/", "-v"], quiet)
+    if result.returncode == 0:
         print("✓ All tests passed")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Some tests failed: {e}")
-        print("STDOUT:", e.stdout)
-        print("STDERR:", e.stderr)
-        return False
+    print(f"✗ Some tests failed (exit code {result.returncode})")
+    _report_failure(result)
+    return False
 
-def run_coverage_tests():
+def run_coverage_tests(quiet: bool = False):
     """Run tests with coverage."""
     print("Running tests with coverage...")
-    try:
-        result = subprocess.run([
-            sys.executable, "-m", "pytest", "tests/", "--cov=src", "--cov-report=html", "--cov-report=term"
-        ], check=True, capture_output=True, text=True)
+    result = _run_pytest(["tests/", "--cov=src", "--cov-report=html", "--cov-report=term"], quiet)
+    if result.returncode == 0:
         print("✓ Coverage tests passed")
         print("Coverage report generated in htmlcov/")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Coverage tests failed: {e}")
-        print("STDOUT:", e.stdout)
-        print("STDERR:", e.stderr)
-        return False
+    print(f"✗ Coverage tests failed (exit code {result.returncode})")
+    _report_failure(result)
+    return False
 
 def main():
     """Main test runner function."""
@@ -77,6 +74,7 @@ def main():
     parser.add_argument("--benchmark", action="store_true", help="Run benchmark tests only")
     parser.add_argument("--coverage", action="store_true", help="Run tests with coverage")
     parser.add_argument("--all", action="store_true", help="Run all tests")
+    parser.add_argument("--quiet", action="store_true", help="Capture pytest output, showing it only on failure")
     
     args = parser.parse_args()
     
@@ -88,16 +86,16 @@ def main():
     success = True
     
     if args.unit:
-        success &= run_unit_tests()
+        success &= run_unit_tests(args.quiet)
     elif args.benchmark:
-        success &= run_benchmark_tests()
+        success &= run_benchmark_tests(args.quiet)
     elif args.coverage:
-        success &= run_coverage_tests()
+        success &= run_coverage_tests(args.quiet)
     elif args.all:
-        success &= run_all_tests()
+        success &= run_all_tests(args.quiet)
     else:
         # Default: run all tests
-        success &= run_all_tests()
+        success &= run_all_tests(args.quiet)
     
     if success:
         print("\n🎉 All tests completed successfully!")
@@ -2,13 +2,18 @@
 WebSocket API for real-time market data and trade execution feeds.
 """
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Request, HTTPException
-from typing import Dict, Any, List
-import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, Request, Response
+from starlette.requests import HTTPConnection
+from types import MappingProxyType
+from typing import Annotated, Dict, Any, List, Mapping, Optional
 import asyncio
+import msgspec
+import orjson
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
+from src.config import settings
 from src.models.order import TradeExecution
 from src.matching_engine.engine import MatchingEngine
 
@@ -16,110 +21,261 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def get_matching_engine(request: Request) -> MatchingEngine:
+# Feed timestamps are wall-clock tags, so a string cached at 1ms
+# granularity is precise enough and avoids re-formatting per message.
+_LAST_TS_NS = 0
+_LAST_TS_STR = ""
+
+def _iso_now() -> str:
+    """Current UTC time as an ISO-8601 string, cached for up to 1ms."""
+    global _LAST_TS_NS, _LAST_TS_STR
+    now_ns = time.time_ns()
+    if now_ns - _LAST_TS_NS > 1_000_000:
+        _LAST_TS_NS = now_ns
+        _LAST_TS_STR = datetime.fromtimestamp(now_ns / 1e9, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+    return _LAST_TS_STR
+
+def get_matching_engine(connection: HTTPConnection) -> MatchingEngine:
     """Get matching engine instance from app state."""
-    return request.app.state.matching_engine
+    return connection.app.state.matching_engine
+
+def get_connection_manager(connection: HTTPConnection) -> "ConnectionManager":
+    """Get WebSocket connection manager from app state."""
+    return connection.app.state.connection_manager
+
+class ClientMessage(msgspec.Struct):
+    """Request sent by a client over the market data WebSocket."""
+    op: str
+    symbol: Optional[str] = None
+    # Out-of-range depths fail decoding and take the malformed message path
+    depth: Optional[Annotated[int, msgspec.Meta(ge=1)]] = None
+
+_CLIENT_MESSAGE_DECODER = msgspec.json.Decoder(ClientMessage)
+
+def _decode_client_message(data: str) -> Optional[ClientMessage]:
+    """Decode a JSON client message; bare text like "get_snapshot" is the op itself."""
+    if not data.startswith("{"):
+        return ClientMessage(op=data)
+    try:
+        return _CLIENT_MESSAGE_DECODER.decode(data)
+    except msgspec.DecodeError as e:
+        logger.debug("Ignoring malformed client message: %s", e)
+        return None
+
+def _encode_read_only(obj: Any) -> Dict[str, Any]:
+    """Encode the engine's shared read-only book views, which orjson does not know."""
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def _encode_snapshot(symbol: str, snapshot: Mapping[str, Any]) -> str:
+    """Encode an order book snapshot message."""
+    return orjson.dumps({
+        "type": "order_book_snapshot",
+        "symbol": symbol,
+        "data": snapshot,
+        "timestamp": _iso_now()
+    }, default=_encode_read_only).decode()
+
+class _FrameRing:
+    """
+    Fixed-size ring of encoded frames for one feed (kind, symbol).
+    
+    The publisher writes each frame once and bumps the sequence number;
+    every subscriber's writer task reads from the ring at its own cursor.
+    Publishing therefore costs the same regardless of subscriber count.
+    """
+    
+    __slots__ = ("frames", "capacity", "seq", "_published")
+    
+    def __init__(self, capacity: int):
+        self.frames: List[Optional[str]] = [None] * capacity
+        self.capacity = capacity
+        self.seq = 0  # Sequence number of the next frame to publish
+        self._published = asyncio.Event()
+    
+    def publish(self, frame: str) -> None:
+        """Append a frame, overwriting the oldest one, and wake the writers."""
+        self.frames[self.seq % self.capacity] = frame
+        self.seq += 1
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+    
+    async def wait(self) -> None:
+        """Wait until the next frame is published."""
+        await self._published.wait()
+
+class _Subscriber:
+    """A WebSocket subscription reading one feed's frame ring."""
+    
+    __slots__ = ("websocket", "kind", "symbol", "ring", "cursor", "writer")
+    
+    def __init__(self, websocket: WebSocket, kind: str, symbol: str, ring: _FrameRing):
+        self.websocket = websocket
+        self.kind = kind
+        self.symbol = symbol
+        self.ring = ring
+        self.cursor = ring.seq  # Only frames published after subscribing
+        self.writer: Optional[asyncio.Task] = None
 
 class ConnectionManager:
-    """Manages WebSocket connections for market data and trade feeds."""
+    """
+    Manages WebSocket connections for market data and trade feeds.
+    
+    Each feed has a ring of pre-encoded frames and every connection has a
+    long-lived writer task that follows the ring, so broadcasting encodes
+    and stores a frame once and a slow client cannot stall the others.
+    """
     
     def __init__(self):
-        self.market_data_connections: Dict[str, List[WebSocket]] = {}
-        self.trade_connections: Dict[str, List[WebSocket]] = {}
+        self.market_data_connections: Dict[str, Dict[WebSocket, _Subscriber]] = {}
+        self.trade_connections: Dict[str, Dict[WebSocket, _Subscriber]] = {}
         self.active_connections: set = set()
+        # Reverse index so disconnect never scans every symbol
+        self._subscribers: Dict[WebSocket, _Subscriber] = {}
+        self._market_data_rings: Dict[str, _FrameRing] = {}
+        self._trade_rings: Dict[str, _FrameRing] = {}
+        # Latest not-yet-sent market data per symbol
+        self._pending_market_data: Dict[str, Mapping[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def connect_market_data(self, websocket: WebSocket, symbol: str):
         """Connect WebSocket for market data feed."""
         await websocket.accept()
-        self.active_connections.add(websocket)
-        
-        if symbol not in self.market_data_connections:
-            self.market_data_connections[symbol] = []
-        self.market_data_connections[symbol].append(websocket)
-        
-        logger.info(f"Market data connection established for {symbol}")
+        self._subscribe(self.market_data_connections, self._market_data_rings, websocket, "market_data", symbol)
+        logger.info("Market data connection established for %s", symbol)
     
     async def connect_trades(self, websocket: WebSocket, symbol: str):
         """Connect WebSocket for trade execution feed."""
         await websocket.accept()
-        self.active_connections.add(websocket)
-        
-        if symbol not in self.trade_connections:
-            self.trade_connections[symbol] = []
-        self.trade_connections[symbol].append(websocket)
+        self._subscribe(self.trade_connections, self._trade_rings, websocket, "trades", symbol)
+        logger.info("Trade feed connection established for %s", symbol)
+    
+    def _subscribe(self, table: Dict[str, Dict[WebSocket, _Subscriber]], rings: Dict[str, _FrameRing],
+                   websocket: WebSocket, kind: str, symbol: str) -> None:
+        """Register a subscriber and start its writer task."""
+        ring = rings.get(symbol)
+        if ring is None:
+            ring = rings[symbol] = _FrameRing(settings.WS_SEND_BUFFER_SIZE)
+        subscriber = _Subscriber(websocket, kind, symbol, ring)
+        subscriber.writer = asyncio.create_task(self._writer(subscriber))
         
-        logger.info(f"Trade feed connection established for {symbol}")
+        self.active_connections.add(websocket)
+        self._subscribers[websocket] = subscriber
+        table.setdefault(symbol, {})[websocket] = subscriber
+    
+    async def _writer(self, subscriber: _Subscriber):
+        """Send a subscriber every frame published on its ring."""
+        ring = subscriber.ring
+        websocket = subscriber.websocket
+        try:
+            while True:
+                if subscriber.cursor == ring.seq:
+                    await ring.wait()
+                    continue
+                
+                if ring.seq - subscriber.cursor > ring.capacity:
+                    # The client fell a full ring behind
+                    if subscriber.kind == "trades":
+                        # Trades must not be dropped silently; cut the client off instead
+                        logger.warning("Disconnecting slow trade feed consumer for %s", subscriber.symbol)
+                        self.disconnect(websocket)
+                        await websocket.close(code=1013, reason="Send buffer overflow")
+                        return
+                    # Market data supersedes itself: skip to the latest update
+                    subscriber.cursor = ring.seq - 1
+                
+                frame = ring.frames[subscriber.cursor % ring.capacity]
+                subscriber.cursor += 1
+                await websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error sending %s data: %s", subscriber.kind, e)
+            self.disconnect(websocket)
     
     def disconnect(self, websocket: WebSocket):
         """Disconnect WebSocket."""
+        subscriber = self._subscribers.pop(websocket, None)
         self.active_connections.discard(websocket)
+        if subscriber is None:
+            return
         
-        # Remove from market data connections
-        for symbol, connections in self.market_data_connections.items():
-            if websocket in connections:
-                connections.remove(websocket)
-        
-        # Remove from trade connections
-        for symbol, connections in self.trade_connections.items():
-            if websocket in connections:
-                connections.remove(websocket)
+        table = self.market_data_connections if subscriber.kind == "market_data" else self.trade_connections
+        subscribers = table.get(subscriber.symbol)
+        if subscribers:
+            subscribers.pop(websocket, None)
+        if subscriber.writer is not asyncio.current_task():
+            subscriber.writer.cancel()
         
         logger.info("WebSocket connection closed")
     
-    async def broadcast_market_data(self, symbol: str, data: Dict[str, Any]):
-        """Broadcast market data to all connected clients for symbol."""
-        if symbol in self.market_data_connections:
-            message = json.dumps({
+    async def close(self) -> None:
+        """Cancel the pending market data flush and every subscriber's writer task."""
+        tasks = [subscriber.writer for subscriber in self._subscribers.values() if subscriber.writer is not None]
+        if self._flush_task is not None:
+            tasks.append(self._flush_task)
+            self._flush_task = None
+        self._pending_market_data.clear()
+        
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def broadcast_market_data(self, symbol: str, data: Mapping[str, Any]):
+        """
+        Schedule market data for all connected clients for symbol.
+        
+        Updates are coalesced: within one flush window only the latest
+        update per symbol is encoded and sent.
+        """
+        if not self.market_data_connections.get(symbol):
+            return
+        
+        self._pending_market_data[symbol] = data
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(
+                self._flush_market_data_after(settings.MARKET_DATA_COALESCE_INTERVAL)
+            )
+    
+    async def _flush_market_data_after(self, delay: float):
+        """Publish the latest pending update per symbol after a short delay."""
+        await asyncio.sleep(delay)
+        pending, self._pending_market_data = self._pending_market_data, {}
+        timestamp = _iso_now()
+        
+        for symbol, data in pending.items():
+            if not self.market_data_connections.get(symbol):
+                continue
+            
+            # Encode once; every subscriber receives the same text frame
+            self._market_data_rings[symbol].publish(orjson.dumps({
                 "type": "market_data",
                 "symbol": symbol,
                 "data": data,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
-            })
-            
-            # Send to all connections for this symbol
-            connections_to_remove = []
-            for websocket in self.market_data_connections[symbol]:
-                try:
-                    await websocket.send_text(message)
-                except Exception as e:
-                    logger.error(f"Error sending market data: {e}")
-                    connections_to_remove.append(websocket)
+                "timestamp": timestamp
+            }, default=_encode_read_only).decode())
+    
+    def broadcast_trades(self, trades: List[TradeExecution]):
+        """Publish a batch of trade executions to the clients of their symbols."""
+        trade_connections = self.trade_connections
+        timestamp = _iso_now()
+        for trade in trades:
+            symbol = trade.symbol
+            if not trade_connections.get(symbol):
+                continue
             
-            # Remove failed connections
-            for websocket in connections_to_remove:
-                self.disconnect(websocket)
-    
-    async def broadcast_trade(self, symbol: str, trade: TradeExecution):
-        """Broadcast trade execution to all connected clients for symbol."""
-        if symbol in self.trade_connections:
-            message = json.dumps({
+            self._trade_rings[symbol].publish(orjson.dumps({
                 "type": "trade_execution",
                 "symbol": symbol,
                 "data": trade.to_dict(),
-                "timestamp": datetime.utcnow().isoformat() + "Z"
-            })
-            
-            # Send to all connections for this symbol
-            connections_to_remove = []
-            for websocket in self.trade_connections[symbol]:
-                try:
-                    await websocket.send_text(message)
-                except Exception as e:
-                    logger.error(f"Error sending trade data: {e}")
-                    connections_to_remove.append(websocket)
-            
-            # Remove failed connections
-            for websocket in connections_to_remove:
-                self.disconnect(websocket)
-
-# Global connection manager
-connection_manager = ConnectionManager()
+                "timestamp": timestamp
+            }).decode())
 
 @router.websocket("/ws/market-data/{symbol}")
 async def market_data_websocket(
     websocket: WebSocket,
-    symbol: str,
-    request: Request
+    symbol: str
 ):
     """
     WebSocket endpoint for real-time market data feed.
@@ -128,10 +284,11 @@ async def market_data_websocket(
         websocket: WebSocket connection
         symbol: Trading pair symbol
     """
-    engine = get_matching_engine(request)
+    engine = get_matching_engine(websocket)
+    connection_manager = get_connection_manager(websocket)
     
     # Validate symbol
-    if symbol.upper() not in engine.get_supported_symbols():
+    if symbol.upper() not in settings.SUPPORTED_SYMBOLS_SET:
         await websocket.close(code=1008, reason="Unsupported symbol")
         return
     
@@ -139,50 +296,31 @@ async def market_data_websocket(
     
     try:
         # Send initial order book snapshot
-        snapshot = engine.get_order_book_snapshot(symbol.upper(), depth=10)
+        snapshot = await engine.get_order_book_snapshot(symbol.upper(), depth=10)
         if snapshot:
-            await websocket.send_text(json.dumps({
-                "type": "order_book_snapshot",
-                "symbol": symbol.upper(),
-                "data": snapshot,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
-            }))
+            await websocket.send_text(_encode_snapshot(symbol.upper(), snapshot))
         
-        # Keep connection alive
+        # Keepalive is handled by protocol-level PING frames (see WS_PING_INTERVAL)
         while True:
-            try:
-                # Wait for ping from client
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
-                
-                # Handle ping/pong
-                if data == "ping":
-                    await websocket.send_text("pong")
-                elif data == "get_snapshot":
-                    # Send current order book snapshot
-                    snapshot = engine.get_order_book_snapshot(symbol.upper(), depth=10)
-                    if snapshot:
-                        await websocket.send_text(json.dumps({
-                            "type": "order_book_snapshot",
-                            "symbol": symbol.upper(),
-                            "data": snapshot,
-                            "timestamp": datetime.utcnow().isoformat() + "Z"
-                        }))
-                        
-            except asyncio.TimeoutError:
-                # Send ping to keep connection alive
-                await websocket.send_text("ping")
+            message = _decode_client_message(await websocket.receive_text())
+            
+            if message is not None and message.op == "get_snapshot":
+                # Send current order book snapshot
+                depth = min(message.depth or 10, settings.MAX_ORDER_BOOK_LEVELS)
+                snapshot = await engine.get_order_book_snapshot(symbol.upper(), depth=depth)
+                if snapshot:
+                    await websocket.send_text(_encode_snapshot(symbol.upper(), snapshot))
                 
     except WebSocketDisconnect:
         connection_manager.disconnect(websocket)
     except Exception as e:
-        logger.error(f"Error in market data WebSocket: {e}")
+        logger.error("Error in market data WebSocket: %s", e)
         connection_manager.disconnect(websocket)
 
 @router.websocket("/ws/trades/{symbol}")
 async def trades_websocket(
     websocket: WebSocket,
-    symbol: str,
-    request: Request
+    symbol: str
 ):
     """
     WebSocket endpoint for real-time trade execution feed.
@@ -191,41 +329,33 @@ async def trades_websocket(
         websocket: WebSocket connection
         symbol: Trading pair symbol
     """
-    engine = get_matching_engine(request)
+    engine = get_matching_engine(websocket)
+    connection_manager = get_connection_manager(websocket)
     
     # Validate symbol
-    if symbol.upper() not in engine.get_supported_symbols():
+    if symbol.upper() not in settings.SUPPORTED_SYMBOLS_SET:
         await websocket.close(code=1008, reason="Unsupported symbol")
         return
     
     await connection_manager.connect_trades(websocket, symbol.upper())
     
     try:
-        # Keep connection alive
+        # Keepalive is handled by protocol-level PING frames (see WS_PING_INTERVAL);
+        # read only to notice the client going away
         while True:
-            try:
-                # Wait for ping from client
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
-                
-                # Handle ping/pong
-                if data == "ping":
-                    await websocket.send_text("pong")
-                    
-            except asyncio.TimeoutError:
-                # Send ping to keep connection alive
-                await websocket.send_text("ping")
+            await websocket.receive_text()
                 
     except WebSocketDisconnect:
         connection_manager.disconnect(websocket)
     except Exception as e:
-        logger.error(f"Error in trades WebSocket: {e}")
+        logger.error("Error in trades WebSocket: %s", e)
         connection_manager.disconnect(websocket)
 
-@router.get("/market-data/{symbol}/bbo")
+@router.get("/market-data/{symbol}/bbo", response_class=Response)
 async def get_best_bid_offer(
     symbol: str,
     engine: MatchingEngine = Depends(get_matching_engine)
-) -> Dict[str, Any]:
+) -> Response:
     """
     Get current best bid and offer for symbol.
     
@@ -233,55 +363,44 @@ async def get_best_bid_offer(
         symbol: Trading pair symbol
         
     Returns:
-        Best bid and offer data
+        Best bid and offer data, encoded straight from the engine's shared read-only view
     """
     bbo = engine.get_best_bid_offer(symbol.upper())
     
     if not bbo:
         raise HTTPException(status_code=404, detail="Symbol not found")
     
-    return bbo
+    return Response(orjson.dumps(bbo, default=_encode_read_only), media_type="application/json")
 
-@router.get("/market-data/{symbol}/orderbook")
+@router.get("/market-data/{symbol}/orderbook", response_class=Response)
 async def get_order_book(
     symbol: str,
-    depth: int = 10,
+    depth: int = Query(10, ge=1, le=settings.MAX_ORDER_BOOK_LEVELS),
     engine: MatchingEngine = Depends(get_matching_engine)
-) -> Dict[str, Any]:
+) -> Response:
     """
     Get order book snapshot for symbol.
     
     Args:
         symbol: Trading pair symbol
-        depth: Number of levels to return (default: 10)
+        depth: Number of levels to return (default: 10, at most MAX_ORDER_BOOK_LEVELS)
         
     Returns:
-        Order book snapshot
+        Order book snapshot, encoded straight from the engine's shared read-only view
     """
-    snapshot = engine.get_order_book_snapshot(symbol.upper(), depth)
+    snapshot = await engine.get_order_book_snapshot(symbol.upper(), depth)
     
     if not snapshot:
         raise HTTPException(status_code=404, detail="Symbol not found")
     
-    return snapshot
+    return Response(orjson.dumps(snapshot, default=_encode_read_only), media_type="application/json")
 
-@router.get("/market-data/symbols")
-async def get_supported_symbols(
-    engine: MatchingEngine = Depends(get_matching_engine)
-) -> List[str]:
+@router.get("/market-data/symbols", response_class=Response)
+async def get_supported_symbols(request: Request) -> Response:
     """
     Get list of supported trading symbols.
     
     Returns:
-        List of supported symbols
+        JSON list of supported symbols, encoded once at startup
     """
-    return engine.get_supported_symbols()
-
-# Global functions for broadcasting (called by matching engine)
-async def broadcast_market_data_update(symbol: str, data: Dict[str, Any]):
-    """Broadcast market data update to all connected clients."""
-    await connection_manager.broadcast_market_data(symbol, data)
-
-async def broadcast_trade_execution(symbol: str, trade: TradeExecution):
-    """Broadcast trade execution to all connected clients."""
-    await connection_manager.broadcast_trade(symbol, trade)
+    return Response(request.app.state.symbols_json, media_type="application/json")
@@ -2,12 +2,15 @@
 REST API for order submission and management.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import Dict, Any, List
-from decimal import Decimal
+from fastapi import APIRouter, HTTPException, Depends, Request, Body
+from pydantic import BaseModel
+from typing import Dict, Any, List, Optional
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 import logging
 
-from src.models.order import Order, OrderSide, OrderType, OrderStatus
+from src.config import settings
+from src.models.order import SIDE_NAMES, Order, OrderIn, OrderSide, OrderType, OrderStatus
 from src.matching_engine.engine import MatchingEngine
 
 logger = logging.getLogger(__name__)
@@ -18,15 +21,39 @@ def get_matching_engine(request: Request) -> MatchingEngine:
     """Get matching engine instance from app state."""
     return request.app.state.matching_engine
 
-class OrderRequest:
-    """Order submission request model."""
-    def __init__(self, symbol: str, side: str, order_type: str, quantity: str, price: str = None, user_id: str = None):
-        self.symbol = symbol
-        self.side = side
-        self.order_type = order_type
-        self.quantity = Decimal(quantity)
-        self.price = Decimal(price) if price else None
-        self.user_id = user_id
+# Prices and sizes repeat heavily at tick granularity, and Decimal is
+# immutable, so parsed values can be shared between requests.
+_parse_decimal = lru_cache(maxsize=4096)(Decimal)
+
+# Request side names to their integer-valued OrderSide
+_SIDES = {name: OrderSide(value) for value, name in enumerate(SIDE_NAMES)}
+
+def _build_order(symbol: str, side: str, order_type: str, quantity: str,
+                 price: Optional[str], user_id: Optional[str]) -> Order:
+    """
+    Validate request fields and build the order handed to the engine.
+    
+    Raises:
+        HTTPException: The side or order type is not recognised
+        InvalidOperation: The quantity or price is not a number
+        ValueError: The order fails model validation
+    """
+    order_side = _SIDES.get(side)
+    if order_side is None:
+        raise HTTPException(status_code=400, detail="Invalid side. Must be 'buy' or 'sell'")
+    
+    if order_type not in ["market", "limit", "ioc", "fok"]:
+        raise HTTPException(status_code=400, detail="Invalid order type. Must be 'market', 'limit', 'ioc', or 'fok'")
+    
+    # Validate the request once, then hand the engine a plain order
+    return OrderIn(
+        symbol=symbol.upper(),
+        side=order_side,
+        order_type=OrderType(order_type),
+        quantity=_parse_decimal(quantity),
+        price=_parse_decimal(price) if price else None,
+        user_id=user_id
+    ).to_order()
 
 @router.post("/orders")
 async def submit_order(
@@ -53,35 +80,86 @@ async def submit_order(
         Order submission result with status and fills
     """
     try:
-        # Validate inputs
-        if side not in ["buy", "sell"]:
-            raise HTTPException(status_code=400, detail="Invalid side. Must be 'buy' or 'sell'")
-        
-        if order_type not in ["market", "limit", "ioc", "fok"]:
-            raise HTTPException(status_code=400, detail="Invalid order type. Must be 'market', 'limit', 'ioc', or 'fok'")
-        
-        # Create order
-        order = Order(
-            symbol=symbol.upper(),
-            side=OrderSide(side),
-            order_type=OrderType(order_type),
-            quantity=Decimal(quantity),
-            price=Decimal(price) if price else None,
-            user_id=user_id
-        )
+        order = _build_order(symbol, side, order_type, quantity, price, user_id)
         
         # Submit to matching engine
         result = await engine.submit_order(order)
         
-        logger.info(f"Order submitted: {order.order_id} - {order.symbol} {order.side} {order.quantity} @ {order.price}")
+        logger.info("Order submitted: %s - %s %s %s @ %s", order.order_id, order.symbol, side, order.quantity, order.price)
         
         return result
         
+    except HTTPException:
+        raise
+    except InvalidOperation:
+        raise HTTPException(status_code=400, detail="Invalid quantity or price")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error submitting order: {e}")
+        logger.error("Error submitting order: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+class OrderRequest(BaseModel):
+    """One order in a batch submission; fields match POST /orders."""
+    symbol: str
+    side: str
+    order_type: str
+    quantity: str
+    price: Optional[str] = None
+    user_id: Optional[str] = None
+
+@router.post("/orders/batch")
+async def submit_orders_batch(
+    orders: List[OrderRequest] = Body(...),
+    engine: MatchingEngine = Depends(get_matching_engine)
+) -> List[Dict[str, Any]]:
+    """
+    Submit several orders in one request.
+    
+    Valid orders go to the engine as one burst and are processed in the
+    given order; an order that fails validation gets an error result in
+    its place without holding back the rest.
+    
+    Args:
+        orders: Orders to submit, at most settings.BATCH_SIZE
+        
+    Returns:
+        One submission result per order, in the order given
+    """
+    if len(orders) > settings.BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {settings.BATCH_SIZE} orders")
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+    accepted: List[Order] = []
+    positions: List[int] = []
+    for index, request in enumerate(orders):
+        try:
+            order = _build_order(
+                request.symbol, request.side, request.order_type,
+                request.quantity, request.price, request.user_id
+            )
+        except HTTPException as e:
+            results[index] = {"status": "error", "message": e.detail}
+        except InvalidOperation:
+            results[index] = {"status": "error", "message": "Invalid quantity or price"}
+        except ValueError as e:
+            results[index] = {"status": "error", "message": str(e)}
+        else:
+            accepted.append(order)
+            positions.append(index)
+    
+    try:
+        submitted = await engine.submit_orders(accepted)
+    except Exception as e:
+        logger.error("Error submitting order batch: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
+    
+    for index, result in zip(positions, submitted):
+        results[index] = result
+    
+    logger.info("Order batch submitted: %d of %d orders accepted", len(accepted), len(orders))
+    
+    return results
 
 @router.get("/orders/{order_id}")
 async def get_order(
@@ -123,7 +201,7 @@ async def cancel_order(
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     
-    logger.info(f"Order cancelled: {order_id}")
+    logger.info("Order cancelled: %s", order_id)
     
     return result
 
@@ -136,6 +214,8 @@ async def get_orders(
     """
     Get orders with optional filtering.
     
+    Filtered queries are served from the engine's indexes of resting orders.
+    
     Args:
         symbol: Filter by trading pair
         user_id: Filter by user ID
@@ -143,17 +223,11 @@ async def get_orders(
     Returns:
         List of orders
     """
-    orders = []
-    
-    for order in engine.active_orders.values():
-        if symbol and order.symbol != symbol.upper():
-            continue
-        if user_id and order.user_id != user_id:
-            continue
-        
-        orders.append(order.to_dict())
+    if symbol and not user_id:
+        return await get_orders_for_symbol(symbol, engine)
     
-    return orders
+    orders = engine.find_orders(symbol.upper() if symbol else None, user_id)
+    return [order.to_dict() for order in orders]
 
 @router.get("/orders/symbol/{symbol}")
 async def get_orders_for_symbol(
@@ -2,17 +2,24 @@
 Configuration settings for the GoQuant Matching Engine.
 """
 
-from pydantic_settings import BaseSettings
-from typing import List
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from decimal import Decimal
+from functools import cached_property
+from typing import FrozenSet, List
 import os
 
 class Settings(BaseSettings):
-    """Application settings."""
+    """Application settings, frozen once loaded."""
+    
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, frozen=True)
     
     # Server configuration
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = False
+    WS_PING_INTERVAL: float = 20.0  # Seconds between WebSocket protocol PINGs
+    WS_PING_TIMEOUT: float = 20.0  # Seconds to wait for a PONG before closing
+    WS_PER_MESSAGE_DEFLATE: bool = False  # Compress WebSocket frames; costs zlib CPU per frame per client
     
     # Matching engine configuration
     MAX_ORDER_SIZE: float = 1000000.0  # Maximum order size
@@ -28,11 +35,14 @@ class Settings(BaseSettings):
     
     # Order book configuration
     MAX_ORDER_BOOK_LEVELS: int = 1000  # Maximum levels in order book
-    ORDER_BOOK_PRECISION: int = 8  # Decimal precision for prices
+    ORDER_BOOK_PRECISION: int = 8  # Decimal places for prices and quantities
     
     # Performance configuration
     MAX_ORDERS_PER_SECOND: int = 10000
     BATCH_SIZE: int = 100  # Orders processed in batch
+    WS_SEND_BUFFER_SIZE: int = 256  # Frames buffered per WebSocket feed
+    MARKET_DATA_COALESCE_INTERVAL: float = 0.005  # Seconds to merge market data updates
+    SHARD_THREADS: bool = False  # Match each symbol on its own CPU-pinned thread (no gain under the GIL)
     
     # Logging configuration
     LOG_LEVEL: str = "INFO"
@@ -44,9 +54,32 @@ class Settings(BaseSettings):
     # Redis configuration (for caching)
     REDIS_URL: str = "redis://localhost:6379"
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    @cached_property
+    def SUPPORTED_SYMBOLS_SET(self) -> FrozenSet[str]:
+        """Supported symbols as a frozenset for O(1) membership checks."""
+        return frozenset(symbol.upper() for symbol in self.SUPPORTED_SYMBOLS)
+    
+    @cached_property
+    def FIXED_POINT_SCALE(self) -> int:
+        """Integer units per whole price or quantity unit (10 ** precision)."""
+        return 10 ** self.ORDER_BOOK_PRECISION
+    
+    # Order limits in fixed-point units, so validation compares integers
+    @cached_property
+    def MAX_ORDER_SIZE_LOTS(self) -> int:
+        return int(Decimal(str(self.MAX_ORDER_SIZE)) * self.FIXED_POINT_SCALE)
+    
+    @cached_property
+    def MIN_ORDER_SIZE_LOTS(self) -> int:
+        return int(Decimal(str(self.MIN_ORDER_SIZE)) * self.FIXED_POINT_SCALE)
+    
+    @cached_property
+    def MAX_PRICE_TICKS(self) -> int:
+        return int(Decimal(str(self.MAX_PRICE)) * self.FIXED_POINT_SCALE)
+    
+    @cached_property
+    def MIN_PRICE_TICKS(self) -> int:
+        return int(Decimal(str(self.MIN_PRICE)) * self.FIXED_POINT_SCALE)
 
 # Global settings instance
 settings = Settings()
@@ -4,18 +4,89 @@ Features price-time priority, internal order protection, and trade-through preve
 """
 
 import asyncio
+import contextlib
 import logging
-from typing import Dict, List, Optional, Set, Callable, Any
-from decimal import Decimal
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Set, Callable, Any, Awaitable, Tuple
 from datetime import datetime
-import uuid
 
-from src.models.order import Order, OrderSide, OrderType, OrderStatus, TradeExecution
+from src.models.order import BestBidOffer, Order, OrderSide, OrderType, OrderStatus, TradeExecution, format_fixed
 from src.matching_engine.order_book import OrderBook
+from src.matching_engine.shard import ShardWorker, ThreadedShardWorker
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Order limits in fixed-point units, resolved once
+_MIN_LOTS = settings.MIN_ORDER_SIZE_LOTS
+_MAX_LOTS = settings.MAX_ORDER_SIZE_LOTS
+_MIN_TICKS = settings.MIN_PRICE_TICKS
+_MAX_TICKS = settings.MAX_PRICE_TICKS
+
+def _error(message: str) -> Mapping[str, str]:
+    """Build a constant, read-only error response."""
+    return MappingProxyType({"status": "error", "message": message})
+
+# Fixed error responses, built once and shared by every caller
+_ERR_NOT_RUNNING = _error("Matching engine not running")
+_ERR_ORDER_NOT_FOUND = _error("Order not found")
+_ERR_NO_BUY_LIQUIDITY = _error("No liquidity available for market buy")
+_ERR_NO_SELL_LIQUIDITY = _error("No liquidity available for market sell")
+_ERR_QUANTITY_NOT_POSITIVE = _error("Quantity must be positive")
+_ERR_QUANTITY_BELOW_MIN = _error(f"Quantity below minimum: {settings.MIN_ORDER_SIZE}")
+_ERR_QUANTITY_ABOVE_MAX = _error(f"Quantity above maximum: {settings.MAX_ORDER_SIZE}")
+_ERR_PRICE_NOT_POSITIVE = _error("Price must be positive")
+_ERR_PRICE_BELOW_MIN = _error(f"Price below minimum: {settings.MIN_PRICE}")
+_ERR_PRICE_ABOVE_MAX = _error(f"Price above maximum: {settings.MAX_PRICE}")
+_ERR_PRICE_REQUIRED = _error("Price is required for limit orders")
+_ERR_ORDER_ALREADY_DONE = {
+    status: _error(f"Order already {status.value}") for status in (OrderStatus.FILLED, OrderStatus.CANCELLED)
+}
+
+def _buy_crosses(price: int, bbo: BestBidOffer) -> bool:
+    """Check whether a buy priced in ticks can trade against the best ask."""
+    best_ask = bbo.best_ask_price
+    return best_ask is not None and price >= best_ask
+
+def _sell_crosses(price: int, bbo: BestBidOffer) -> bool:
+    """Check whether a sell priced in ticks can trade against the best bid."""
+    best_bid = bbo.best_bid_price
+    return best_bid is not None and price <= best_bid
+
+# Marketability of priced orders, indexed by OrderSide
+_CROSSES = (_buy_crosses, _sell_crosses)
+
+def _snapshot_dict(order_book: OrderBook, depth: int) -> Mapping[str, Any]:
+    """Build a book snapshot's dictionary on the thread that owns the book."""
+    return order_book.get_order_book_snapshot(depth).to_dict()
+
+def _safe_sync(callback: Callable[..., None], kind: str) -> Callable[..., None]:
+    """Wrap a sync callback so its errors are logged instead of raised."""
+    def wrapper(*args: Any) -> None:
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error("Error in %s callback: %s", kind, e)
+    return wrapper
+
+def _with_lock(lock: threading.Lock, method: Callable[..., None]) -> Callable[..., None]:
+    """Wrap a method so it runs while holding lock."""
+    def wrapper(*args: Any) -> None:
+        with lock:
+            method(*args)
+    return wrapper
+
+def _safe_async(callback: Callable[..., Awaitable[None]], kind: str) -> Callable[..., Awaitable[None]]:
+    """Wrap an async callback so its errors are logged instead of raised."""
+    async def wrapper(*args: Any) -> None:
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.error("Error in %s callback: %s", kind, e)
+    return wrapper
+
 class MatchingEngine:
     """
     High-performance matching engine implementing REG NMS principles.
@@ -25,362 +96,474 @@ class MatchingEngine:
     - Internal order protection (no trade-throughs)
     - Support for Market, Limit, IOC, and FOK orders
     - Real-time trade execution generation
+    - Per-symbol command sequencing, so symbols never contend
     - Comprehensive logging and audit trail
     """
     
     def __init__(self):
         self.order_books: Dict[str, OrderBook] = {}
         self.active_orders: Dict[str, Order] = {}
-        self.trade_callbacks: List[Callable[[TradeExecution], None]] = []
-        self.market_data_callbacks: List[Callable[[str, Any], None]] = []
+        # Indexes of order IDs resting on the books
+        self.orders_by_symbol: Dict[str, Set[str]] = {}
+        self.orders_by_user: Dict[str, Set[str]] = {}
+        # Number of orders resting on the books, kept for cheap health probes
+        self.open_order_count = 0
+        # Callbacks are split by kind at registration so notifying never inspects them
+        self._sync_trade_callbacks: List[Callable[[List[TradeExecution]], None]] = []
+        self._async_trade_callbacks: List[Callable[[List[TradeExecution]], Awaitable[None]]] = []
+        self._sync_market_data_callbacks: List[Callable[[str, Any], None]] = []
+        self._async_market_data_callbacks: List[Callable[[str, Any], Awaitable[None]]] = []
         self.running = False
-        self._lock = asyncio.Lock()
+        # Last BBO published per symbol; unchanged quotes are not published again
+        self._last_published_bbo: Dict[str, BestBidOffer] = {}
+        # Order type handlers, looked up once per order
+        self._dispatch: Dict[OrderType, Callable[[Order, OrderBook, List[TradeExecution]], Mapping[str, Any]]] = {
+            OrderType.MARKET: self._process_market_order,
+            OrderType.LIMIT: self._process_limit_order,
+            OrderType.IOC: self._process_ioc_order,
+            OrderType.FOK: self._process_fok_order,
+        }
+        # One command sequencer per symbol; books are only touched by their shard
+        self._shards: Dict[str, ShardWorker] = {}
+        # Shard threads share the resting-order indexes, so only then are updates to them locked;
+        # the default shards all run on the event loop and skip the lock entirely
+        if settings.SHARD_THREADS:
+            self._state_lock = threading.Lock()
+            self._add_resting_order = _with_lock(self._state_lock, self._add_resting_order)
+            self._remove_resting_order = _with_lock(self._state_lock, self._remove_resting_order)
+        else:
+            self._state_lock = contextlib.nullcontext()
+        cpu_count = os.cpu_count() or 1
         
         # Initialize order books for supported symbols
-        for symbol in settings.SUPPORTED_SYMBOLS:
-            self.order_books[symbol] = OrderBook(symbol)
+        for index, symbol in enumerate(settings.SUPPORTED_SYMBOLS):
+            order_book = self.order_books[symbol] = OrderBook(symbol)
+            self.orders_by_symbol[symbol] = set()
+            if settings.SHARD_THREADS:
+                self._shards[symbol] = ThreadedShardWorker(symbol, order_book, self._publish, index,
+                                                           cpu=index % cpu_count)
+            else:
+                self._shards[symbol] = ShardWorker(symbol, order_book, self._publish, index)
     
     async def initialize(self) -> None:
         """Initialize the matching engine."""
         logger.info("Initializing matching engine...")
+        for shard in self._shards.values():
+            shard.start()
         self.running = True
-        logger.info(f"Initialized order books for {len(self.order_books)} symbols")
+        logger.info("Initialized order books for %d symbols", len(self.order_books))
     
     async def shutdown(self) -> None:
         """Shutdown the matching engine."""
         logger.info("Shutting down matching engine...")
         self.running = False
+        for shard in self._shards.values():
+            await shard.stop()
         logger.info("Matching engine shutdown complete")
     
-    def add_trade_callback(self, callback: Callable[[TradeExecution], None]) -> None:
-        """Add callback for trade executions."""
-        self.trade_callbacks.append(callback)
+    def add_trade_callback(self, callback: Callable[[List[TradeExecution]], None]) -> None:
+        """Add callback for trade executions, called once per match with all its fills."""
+        if asyncio.iscoroutinefunction(callback):
+            self._async_trade_callbacks.append(_safe_async(callback, "trade"))
+        else:
+            self._sync_trade_callbacks.append(_safe_sync(callback, "trade"))
     
     def add_market_data_callback(self, callback: Callable[[str, Any], None]) -> None:
         """Add callback for market data updates."""
-        self.market_data_callbacks.append(callback)
+        if asyncio.iscoroutinefunction(callback):
+            self._async_market_data_callbacks.append(_safe_async(callback, "market data"))
+        else:
+            self._sync_market_data_callbacks.append(_safe_sync(callback, "market data"))
     
-    async def submit_order(self, order: Order) -> Dict[str, Any]:
+    async def submit_order(self, order: Order) -> Mapping[str, Any]:
         """
         Submit an order to the matching engine.
         
         Args:
             order: Order to submit
-            
+        
         Returns:
             Dictionary containing order status and any fills
         """
-        async with self._lock:
-            if not self.running:
-                return {"status": "error", "message": "Matching engine not running"}
-            
-            if order.symbol not in self.order_books:
-                return {"status": "error", "message": f"Unsupported symbol: {order.symbol}"}
-            
-            # Validate order
-            validation_result = self._validate_order(order)
-            if not validation_result["valid"]:
-                return {"status": "error", "message": validation_result["message"]}
-            
-            # Store active order
-            self.active_orders[order.order_id] = order
-            
-            # Process order based on type
-            if order.order_type == OrderType.MARKET:
-                return await self._process_market_order(order)
-            elif order.order_type == OrderType.LIMIT:
-                return await self._process_limit_order(order)
-            elif order.order_type == OrderType.IOC:
-                return await self._process_ioc_order(order)
-            elif order.order_type == OrderType.FOK:
-                return await self._process_fok_order(order)
-            else:
-                return {"status": "error", "message": f"Unsupported order type: {order.order_type}"}
+        if not self.running:
+            return _ERR_NOT_RUNNING
+        
+        shard = self._shards.get(order.symbol)
+        if shard is None:
+            return {"status": "error", "message": f"Unsupported symbol: {order.symbol}"}
+        
+        return await shard.submit(self._execute_order, order, shard.order_book)
     
-    def _validate_order(self, order: Order) -> Dict[str, Any]:
-        """Validate order parameters."""
-        if order.quantity <= 0:
-            return {"valid": False, "message": "Quantity must be positive"}
+    async def submit_orders(self, orders: List[Order]) -> List[Mapping[str, Any]]:
+        """
+        Submit a burst of orders, running each symbol's share as one shard command.
         
-        if order.quantity < settings.MIN_ORDER_SIZE:
-            return {"valid": False, "message": f"Quantity below minimum: {settings.MIN_ORDER_SIZE}"}
+        Orders for a symbol are processed in the given order, and each symbol
+        publishes its trades and market data once for the whole burst.
         
-        if order.quantity > settings.MAX_ORDER_SIZE:
-            return {"valid": False, "message": f"Quantity above maximum: {settings.MAX_ORDER_SIZE}"}
+        Args:
+            orders: Orders to submit
         
-        if order.price is not None:
-            if order.price <= 0:
-                return {"valid": False, "message": "Price must be positive"}
-            
-            if order.price < settings.MIN_PRICE:
-                return {"valid": False, "message": f"Price below minimum: {settings.MIN_PRICE}"}
-            
-            if order.price > settings.MAX_PRICE:
-                return {"valid": False, "message": f"Price above maximum: {settings.MAX_PRICE}"}
+        Returns:
+            One result per order, in the order given
+        """
+        if not self.running:
+            return [_ERR_NOT_RUNNING] * len(orders)
+        
+        results: List[Optional[Mapping[str, Any]]] = [None] * len(orders)
+        batches: Dict[str, List[int]] = {}
+        for index, order in enumerate(orders):
+            if order.symbol in self._shards:
+                batches.setdefault(order.symbol, []).append(index)
+            else:
+                results[index] = {"status": "error", "message": f"Unsupported symbol: {order.symbol}"}
+        
+        async def submit_batch(symbol: str, indexes: List[int]) -> None:
+            shard = self._shards[symbol]
+            batch = [orders[index] for index in indexes]
+            for index, result in zip(indexes, await shard.submit(self._execute_orders, batch, shard.order_book)):
+                results[index] = result
+        
+        await asyncio.gather(*(submit_batch(symbol, indexes) for symbol, indexes in batches.items()))
+        return results
+    
+    def _execute_orders(self, orders: List[Order], order_book: OrderBook) -> Tuple[List[Mapping[str, Any]], List[TradeExecution], bool]:
+        """Process a burst of one symbol's orders on its shard, publishing once afterwards."""
+        fills: List[TradeExecution] = []
+        results = [self._process_order(order, order_book, fills) for order in orders]
         
-        if order.order_type == OrderType.LIMIT and order.price is None:
-            return {"valid": False, "message": "Price required for limit orders"}
+        resting = self.orders_by_symbol[order_book.symbol]
+        return results, fills, bool(fills) or any(order.order_id in resting for order in orders)
+    
+    def _execute_order(self, order: Order, order_book: OrderBook) -> Tuple[Mapping[str, Any], List[TradeExecution], bool]:
+        """Process an order on its symbol's shard; the shard then publishes what changed."""
+        fills: List[TradeExecution] = []
+        result = self._process_order(order, order_book, fills)
         
-        return {"valid": True}
+        # The book changed if the order traded or now rests on it
+        return result, fills, bool(fills) or order.order_id in self.orders_by_symbol[order.symbol]
+    
+    async def _publish(self, fills: List[TradeExecution], bbo: Optional[BestBidOffer]) -> None:
+        """Run callbacks for a processed command, after matching is done."""
+        if fills:
+            await self._notify_trades(fills)
+        if bbo is not None:
+            await self._notify_market_data_update(bbo)
     
-    async def _process_market_order(self, order: Order) -> Dict[str, Any]:
+    def _process_order(self, order: Order, order_book: OrderBook, fills: List[TradeExecution]) -> Mapping[str, Any]:
+        """Validate and match an order, appending any trades to fills."""
+        # Validate order
+        error = self._validate_order(order)
+        if error is not None:
+            return error
+        
+        # Store active order
+        self.active_orders[order.order_id] = order
+        
+        # Process order based on type
+        handler = self._dispatch.get(order.order_type)
+        if handler is None:
+            return {"status": "error", "message": f"Unsupported order type: {order.order_type}"}
+        return handler(order, order_book, fills)
+    
+    def _validate_order(self, order: Order) -> Optional[Mapping[str, str]]:
+        """
+        Check order size and price against the configured limits.
+        
+        API requests are already validated by OrderIn; these checks also
+        cover orders built directly, and a valid order costs two range
+        checks plus the limit-price test.
+        
+        Returns:
+            None for a valid order, otherwise the shared error response
+        """
+        quantity = order.quantity_lots
+        if not _MIN_LOTS <= quantity <= _MAX_LOTS:
+            if quantity <= 0:
+                return _ERR_QUANTITY_NOT_POSITIVE
+            if quantity < _MIN_LOTS:
+                return _ERR_QUANTITY_BELOW_MIN
+            return _ERR_QUANTITY_ABOVE_MAX
+        
+        price = order.price_ticks
+        if price is not None and not _MIN_TICKS <= price <= _MAX_TICKS:
+            if price <= 0:
+                return _ERR_PRICE_NOT_POSITIVE
+            if price < _MIN_TICKS:
+                return _ERR_PRICE_BELOW_MIN
+            return _ERR_PRICE_ABOVE_MAX
+        if price is None and order.order_type == OrderType.LIMIT:
+            return _ERR_PRICE_REQUIRED
+        
+        return None
+    
+    def _process_market_order(self, order: Order, order_book: OrderBook, fills: List[TradeExecution]) -> Mapping[str, Any]:
         """Process market order - execute immediately at best available price."""
-        order_book = self.order_books[order.symbol]
         bbo = order_book.get_best_bid_offer()
         
         if order.side == OrderSide.BUY:
-            if not bbo.best_ask:
-                return {"status": "error", "message": "No liquidity available for market buy"}
-            max_price = bbo.best_ask.price
+            max_price = bbo.best_ask_price
+            if max_price is None:
+                return _ERR_NO_BUY_LIQUIDITY
         else:
-            if not bbo.best_bid:
-                return {"status": "error", "message": "No liquidity available for market sell"}
-            max_price = bbo.best_bid.price
+            max_price = bbo.best_bid_price
+            if max_price is None:
+                return _ERR_NO_SELL_LIQUIDITY
         
-        return await self._match_order(order, max_price)
+        return self._match_order(order, order_book, max_price, fills)
     
-    async def _process_limit_order(self, order: Order) -> Dict[str, Any]:
+    def _process_limit_order(self, order: Order, order_book: OrderBook, fills: List[TradeExecution]) -> Mapping[str, Any]:
         """Process limit order - execute if marketable, otherwise add to book."""
-        order_book = self.order_books[order.symbol]
         bbo = order_book.get_best_bid_offer()
         
         # Check if order is marketable
-        if order.is_marketable(bbo.best_bid.price if bbo.best_bid else None,
-                              bbo.best_ask.price if bbo.best_ask else None):
+        if _CROSSES[order.side](order.price_ticks, bbo):
             # Execute immediately
-            if order.side == OrderSide.BUY:
-                max_price = order.price
-            else:
-                max_price = order.price
-            
-            result = await self._match_order(order, max_price)
+            result = self._match_order(order, order_book, order.price_ticks, fills)
             
             # If partially filled, add remainder to book
-            if result["status"] == "partially_filled" and order.remaining_quantity > 0:
-                order_book.add_order(order)
-                await self._notify_market_data_update(order.symbol)
+            if result["status"] == "partially_filled" and order.remaining_lots > 0:
+                self._add_resting_order(order_book, order)
             
             return result
         else:
             # Add to order book
-            order_book.add_order(order)
-            await self._notify_market_data_update(order.symbol)
+            self._add_resting_order(order_book, order)
             return {"status": "pending", "order_id": order.order_id}
     
-    async def _process_ioc_order(self, order: Order) -> Dict[str, Any]:
+    def _process_ioc_order(self, order: Order, order_book: OrderBook, fills: List[TradeExecution]) -> Mapping[str, Any]:
         """Process IOC order - execute immediately or cancel."""
-        order_book = self.order_books[order.symbol]
         bbo = order_book.get_best_bid_offer()
         
         # IOC orders require a price
-        if order.price is None:
+        if order.price_ticks is None:
             order.status = OrderStatus.REJECTED
             return {"status": "rejected", "order_id": order.order_id, "message": "IOC orders require a price"}
         
-        if not order.is_marketable(bbo.best_bid.price if bbo.best_bid else None,
-                                   bbo.best_ask.price if bbo.best_ask else None):
+        if not _CROSSES[order.side](order.price_ticks, bbo):
             # Cancel order
             order.status = OrderStatus.CANCELLED
             return {"status": "cancelled", "order_id": order.order_id}
         
         # Execute immediately
-        if order.side == OrderSide.BUY:
-            max_price = order.price
-        else:
-            max_price = order.price
-        
-        result = await self._match_order(order, max_price)
+        result = self._match_order(order, order_book, order.price_ticks, fills)
         
         # Cancel any remaining quantity
-        if order.remaining_quantity > 0:
+        if order.remaining_lots > 0:
             order.status = OrderStatus.CANCELLED
         
         return result
     
-    async def _process_fok_order(self, order: Order) -> Dict[str, Any]:
+    def _process_fok_order(self, order: Order, order_book: OrderBook, fills: List[TradeExecution]) -> Mapping[str, Any]:
         """Process FOK order - execute completely or cancel entirely."""
-        order_book = self.order_books[order.symbol]
         bbo = order_book.get_best_bid_offer()
         
         # FOK orders require a price
-        if order.price is None:
+        if order.price_ticks is None:
             order.status = OrderStatus.REJECTED
             return {"status": "rejected", "order_id": order.order_id, "message": "FOK orders require a price"}
         
-        if not order.is_marketable(bbo.best_bid.price if bbo.best_bid else None,
-                                   bbo.best_ask.price if bbo.best_ask else None):
+        if not _CROSSES[order.side](order.price_ticks, bbo):
             # Cancel order
             order.status = OrderStatus.CANCELLED
             return {"status": "cancelled", "order_id": order.order_id}
         
         # Check if we can fill the entire order
-        if order.side == OrderSide.BUY:
-            max_price = order.price
-        else:
-            max_price = order.price
+        max_price = order.price_ticks
         
-        # Get all marketable orders
-        marketable_orders = order_book.get_marketable_orders(order.side, max_price)
+        # Walk only as much of the book as it takes to cover the order
+        total_available = order_book.available_quantity_up_to(order.side, max_price, order.quantity_lots)
         
-        # Calculate total available quantity
-        total_available = sum(o.remaining_quantity for o in marketable_orders)
-        
-        if total_available < order.quantity:
+        if total_available < order.quantity_lots:
             # Cannot fill completely - cancel
             order.status = OrderStatus.CANCELLED
             return {"status": "cancelled", "order_id": order.order_id}
         
         # Execute completely
-        result = await self._match_order(order, max_price)
+        result = self._match_order(order, order_book, max_price, fills)
         
-        if order.remaining_quantity > 0:
+        if order.remaining_lots > 0:
             # This shouldn't happen for FOK, but handle it
             order.status = OrderStatus.CANCELLED
         
         return result
     
-    async def _match_order(self, order: Order, max_price: Decimal) -> Dict[str, Any]:
+    def _match_order(self, order: Order, order_book: OrderBook, max_price: int,
+                     fills: List[TradeExecution]) -> Dict[str, Any]:
         """
         Match order against the order book with price-time priority.
         
         Args:
             order: Order to match
-            max_price: Maximum price to match at
-            
+            order_book: Book of the order's symbol
+            max_price: Maximum price to match at, in ticks
+            fills: List the resulting trades are appended to
+        
         Returns:
             Dictionary containing match results
         """
-        order_book = self.order_books[order.symbol]
-        fills = []
-        
-        # Get marketable orders in price-time priority order
-        marketable_orders = order_book.get_marketable_orders(order.side, max_price)
-        
-        for resting_order in marketable_orders:
-            if order.remaining_quantity <= 0:
-                break
-            
+        first_fill = len(fills)
+        symbol = order.symbol
+        side = order.side
+        taker_order_id = order.order_id
+        # Sequential per-shard trade IDs; cheaper per fill than a random UUID
+        next_trade_id = self._shards[symbol].next_trade_id
+        # All fills of one match share its timestamp
+        timestamp = datetime.utcnow()
+        # Hot-loop locals; the taker's quantities are written back once after the loop
+        remaining = order.remaining_lots
+        filled = order.filled_lots
+        add_fill = fills.append
+        reduce_order = order_book.reduce_order
+        remove_resting_order = self._remove_resting_order
+        FILLED = OrderStatus.FILLED
+        PARTIALLY_FILLED = OrderStatus.PARTIALLY_FILLED
+        
+        # Walk marketable orders lazily in price-time priority
+        for resting_order in order_book.iter_marketable_orders(side, max_price):
             # Calculate fill quantity
-            fill_quantity = min(order.remaining_quantity, resting_order.remaining_quantity)
+            resting_remaining = resting_order.remaining_lots
+            fill_quantity = remaining if remaining < resting_remaining else resting_remaining
+            remaining -= fill_quantity
+            filled += fill_quantity
             
             # Create trade execution
-            trade = TradeExecution(
-                symbol=order.symbol,
-                price=resting_order.price,
-                quantity=fill_quantity,
-                aggressor_side=order.side,
+            add_fill(TradeExecution(
+                trade_id=str(next_trade_id()),
+                symbol=symbol,
+                price_ticks=resting_order.price_ticks,
+                quantity_lots=fill_quantity,
+                aggressor_side=side,
                 maker_order_id=resting_order.order_id,
-                taker_order_id=order.order_id
-            )
-            
-            # Update order quantities
-            order.filled_quantity += fill_quantity
-            order.remaining_quantity -= fill_quantity
-            resting_order.filled_quantity += fill_quantity
-            resting_order.remaining_quantity -= fill_quantity
+                taker_order_id=taker_order_id,
+                timestamp=timestamp
+            ))
             
-            # Update order statuses
-            if order.remaining_quantity <= 0:
-                order.status = OrderStatus.FILLED
-            elif order.filled_quantity > 0:
-                order.status = OrderStatus.PARTIALLY_FILLED
-            
-            if resting_order.remaining_quantity <= 0:
-                resting_order.status = OrderStatus.FILLED
-                # Remove from order book
-                order_book.remove_order(resting_order)
-            elif resting_order.filled_quantity > 0:
-                resting_order.status = OrderStatus.PARTIALLY_FILLED
-            
-            fills.append(trade)
+            # Update the resting order
+            resting_order.filled_lots += fill_quantity
+            if fill_quantity == resting_remaining:
+                # Remove from order book while its remaining quantity is still on the level
+                remove_resting_order(order_book, resting_order)
+                resting_order.remaining_lots = 0
+                resting_order.status = FILLED
+            else:
+                reduce_order(resting_order, fill_quantity)
+                resting_order.remaining_lots = resting_remaining - fill_quantity
+                resting_order.status = PARTIALLY_FILLED
             
-            # Notify trade execution
-            await self._notify_trade_execution(trade)
+            # Stop before the iterator looks up another resting order
+            if not remaining:
+                break
         
-        # Update order book if needed
-        if fills:
-            await self._notify_market_data_update(order.symbol)
+        order.remaining_lots = remaining
+        order.filled_lots = filled
         
         # Determine final status
-        if order.remaining_quantity <= 0:
+        if not remaining:
+            order.status = FILLED
             status = "filled"
-        elif order.filled_quantity > 0:
+        elif filled > 0:
+            order.status = PARTIALLY_FILLED
             status = "partially_filled"
         else:
             status = "pending"
         
+        to_dict = TradeExecution.to_dict
         return {
             "status": status,
             "order_id": order.order_id,
-            "fills": [fill.to_dict() for fill in fills],
-            "filled_quantity": str(order.filled_quantity),
-            "remaining_quantity": str(order.remaining_quantity)
+            "fills": [to_dict(fill) for fill in fills[first_fill:]],
+            "filled_quantity": format_fixed(filled),
+            "remaining_quantity": format_fixed(remaining)
         }
     
-    async def cancel_order(self, order_id: str) -> Dict[str, Any]:
+    async def cancel_order(self, order_id: str) -> Mapping[str, Any]:
         """Cancel an active order."""
-        async with self._lock:
-            if order_id not in self.active_orders:
-                return {"status": "error", "message": "Order not found"}
-            
-            order = self.active_orders[order_id]
-            
-            if order.status in [OrderStatus.FILLED, OrderStatus.CANCELLED]:
-                return {"status": "error", "message": f"Order already {order.status.value}"}
-            
-            # Remove from order book if it's resting
-            if order.order_type == OrderType.LIMIT and order.remaining_quantity > 0:
-                order_book = self.order_books[order.symbol]
-                order_book.remove_order(order)
-                await self._notify_market_data_update(order.symbol)
-            
-            # Update order status
-            order.status = OrderStatus.CANCELLED
-            
-            return {"status": "cancelled", "order_id": order_id}
-    
-    async def _notify_trade_execution(self, trade: TradeExecution) -> None:
-        """Notify all trade execution callbacks."""
-        for callback in self.trade_callbacks:
-            try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(trade)
-                else:
-                    callback(trade)
-            except Exception as e:
-                logger.error(f"Error in trade callback: {e}")
+        order = self.active_orders.get(order_id)
+        if order is None:
+            return _ERR_ORDER_NOT_FOUND
+        
+        # Cancels are sequenced with the orders for the same book
+        shard = self._shards[order.symbol]
+        return await shard.submit(self._execute_cancel, order, shard.order_book)
     
-    async def _notify_market_data_update(self, symbol: str) -> None:
-        """Notify all market data callbacks."""
-        order_book = self.order_books[symbol]
-        bbo = order_book.get_best_bid_offer()
+    def _execute_cancel(self, order: Order, order_book: OrderBook) -> Tuple[Mapping[str, Any], List[TradeExecution], bool]:
+        """Cancel an order on its symbol's shard."""
+        if order.status is OrderStatus.FILLED or order.status is OrderStatus.CANCELLED:
+            return _ERR_ORDER_ALREADY_DONE[order.status], [], False
         
-        for callback in self.market_data_callbacks:
-            try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(symbol, bbo.to_dict())
-                else:
-                    callback(symbol, bbo.to_dict())
-            except Exception as e:
-                logger.error(f"Error in market data callback: {e}")
+        # Remove from order book if it's resting
+        book_changed = order.order_type == OrderType.LIMIT and order.remaining_lots > 0
+        if book_changed:
+            self._remove_resting_order(order_book, order)
+        
+        # Update order status
+        order.status = OrderStatus.CANCELLED
+        
+        return {"status": "cancelled", "order_id": order.order_id}, [], book_changed
+    
+    def _add_resting_order(self, order_book: OrderBook, order: Order) -> None:
+        """Rest an order on its book and index it."""
+        order_book.add_order(order)
+        self.orders_by_symbol[order.symbol].add(order.order_id)
+        self.open_order_count += 1
+        if order.user_id is not None:
+            self.orders_by_user.setdefault(order.user_id, set()).add(order.order_id)
+    
+    def _remove_resting_order(self, order_book: OrderBook, order: Order) -> None:
+        """Take an order off its book and drop it from the indexes."""
+        if order_book.remove_order(order):
+            self.open_order_count -= 1
+        self.orders_by_symbol[order.symbol].discard(order.order_id)
+        if order.user_id is not None:
+            user_orders = self.orders_by_user.get(order.user_id)
+            if user_orders is not None:
+                user_orders.discard(order.order_id)
+                if not user_orders:
+                    del self.orders_by_user[order.user_id]
+    
+    async def _notify_trades(self, trades: List[TradeExecution]) -> None:
+        """Notify all trade execution callbacks with a batch of fills."""
+        for callback in self._sync_trade_callbacks:
+            callback(trades)
+        if self._async_trade_callbacks:
+            await asyncio.gather(*(callback(trades) for callback in self._async_trade_callbacks))
+    
+    async def _notify_market_data_update(self, bbo: BestBidOffer) -> None:
+        """Notify all market data callbacks when the top of book moved."""
+        symbol = bbo.symbol
+        
+        # Changes below the top of book rebuild the BBO without changing it
+        last = self._last_published_bbo.get(symbol)
+        if last is not None and (last is bbo or (last.best_bid == bbo.best_bid and last.best_ask == bbo.best_ask)):
+            return
+        self._last_published_bbo[symbol] = bbo
+        data = bbo.to_dict()
+        
+        for callback in self._sync_market_data_callbacks:
+            callback(symbol, data)
+        if self._async_market_data_callbacks:
+            await asyncio.gather(*(callback(symbol, data) for callback in self._async_market_data_callbacks))
     
     def get_order(self, order_id: str) -> Optional[Order]:
         """Get order by ID."""
         return self.active_orders.get(order_id)
     
-    def get_best_bid_offer(self, symbol: str) -> Optional[Dict[str, Any]]:
+    def get_best_bid_offer(self, symbol: str) -> Optional[Mapping[str, Any]]:
         """Get best bid and offer for symbol."""
-        if symbol not in self.order_books:
+        shard = self._shards.get(symbol)
+        if shard is None:
             return None
         
-        return self.order_books[symbol].get_best_bid_offer().to_dict()
+        return shard.best_bid_offer().to_dict()
     
-    def get_order_book_snapshot(self, symbol: str, depth: int = 10) -> Optional[Dict[str, Any]]:
-        """Get order book snapshot for symbol."""
-        if symbol not in self.order_books:
+    async def get_order_book_snapshot(self, symbol: str, depth: int = 10) -> Optional[Mapping[str, Any]]:
+        """Get order book snapshot for symbol, read in turn with the symbol's commands."""
+        shard = self._shards.get(symbol)
+        if shard is None:
             return None
         
-        return self.order_books[symbol].get_order_book_snapshot(depth).to_dict()
+        return await shard.read(_snapshot_dict, shard.order_book, depth)
     
     def get_supported_symbols(self) -> List[str]:
         """Get list of supported trading symbols."""
@@ -391,5 +574,34 @@ class MatchingEngine:
         return len(self.active_orders)
     
     def get_active_orders_for_symbol(self, symbol: str) -> List[Order]:
-        """Get all active orders for a specific symbol."""
-        return [order for order in self.active_orders.values() if order.symbol == symbol]
+        """Get all open (resting) orders for a specific symbol."""
+        with self._state_lock:
+            active_orders = self.active_orders
+            return [active_orders[order_id] for order_id in self.orders_by_symbol.get(symbol, ())]
+    
+    def find_orders(self, symbol: Optional[str] = None, user_id: Optional[str] = None) -> List[Order]:
+        """
+        Get orders filtered by symbol and/or user.
+        
+        Filtered lookups are served from the indexes of resting orders.
+        
+        Args:
+            symbol: Only orders for this symbol
+            user_id: Only orders of this user
+            
+        Returns:
+            Matching resting orders, or every known order when no filter is given
+        """
+        with self._state_lock:
+            if symbol and user_id:
+                order_ids = self.orders_by_user.get(user_id, set()) & self.orders_by_symbol.get(symbol, set())
+            elif symbol:
+                order_ids = self.orders_by_symbol.get(symbol, set())
+            elif user_id:
+                order_ids = self.orders_by_user.get(user_id, set())
+            else:
+                # Orders are only ever added to active_orders, so a copy of its keys is always complete
+                order_ids = list(self.active_orders)
+            
+            active_orders = self.active_orders
+            return [active_orders[order_id] for order_id in order_ids]
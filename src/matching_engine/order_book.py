@@ -1,36 +1,76 @@
 """
-Order book implementation using red-black tree for O(log n) operations.
+Order book implementation using sorted price-level maps for O(log n) operations.
 Implements price-time priority with FIFO ordering at each price level.
 """
 
-from typing import Optional, List, Dict, Any, Tuple
-from decimal import Decimal
-from collections import deque
-import heapq
+from typing import Optional, List, Dict, Iterator
 from dataclasses import dataclass
-from enum import Enum
+from itertools import islice
 
+from sortedcontainers import SortedDict
+
+from src.config import settings
 from src.models.order import Order, OrderSide, OrderBookLevel, BestBidOffer, OrderBookSnapshot
 
-class Color(Enum):
-    """Red-black tree node color."""
-    RED = "red"
-    BLACK = "black"
+# Upper bound on emptied price levels kept for reuse per book
+LEVEL_POOL_SIZE = 4096
+
+# Snapshot depths worth caching; other depths are built on every request so
+# arbitrary client-chosen depths cannot pile up in the cache
+SNAPSHOT_CACHE_DEPTHS = frozenset((10, 20, 50))
 
-@dataclass
-class OrderBookNode:
-    """Node in the order book red-black tree."""
-    price: Decimal
-    orders: deque  # FIFO queue of orders at this price level
-    total_quantity: Decimal
-    color: Color = Color.RED
-    left: Optional['OrderBookNode'] = None
-    right: Optional['OrderBookNode'] = None
-    parent: Optional['OrderBookNode'] = None
+@dataclass(slots=True)
+class PriceLevel:
+    """
+    All resting orders at one price on one side of the book.
+    
+    The orders form an intrusive doubly-linked FIFO through their
+    prev_in_level/next_in_level fields, so any order unlinks in O(1).
+    """
+    price: int  # Price in ticks
+    total_quantity: int  # Resting quantity in lots
+    head: Optional[Order] = None  # Oldest order, matched first
+    tail: Optional[Order] = None  # Newest order
+    order_count: int = 0
+    
+    def append(self, order: Order) -> None:
+        """Queue an order behind the others at this price."""
+        tail = self.tail
+        order.prev_in_level = tail
+        order.next_in_level = None
+        if tail is None:
+            self.head = order
+        else:
+            tail.next_in_level = order
+        self.tail = order
+        self.order_count += 1
+    
+    def unlink(self, order: Order) -> None:
+        """Take an order out of the queue, wherever it sits."""
+        prev_order = order.prev_in_level
+        next_order = order.next_in_level
+        if prev_order is None:
+            self.head = next_order
+        else:
+            prev_order.next_in_level = next_order
+        if next_order is None:
+            self.tail = prev_order
+        else:
+            next_order.prev_in_level = prev_order
+        order.prev_in_level = order.next_in_level = None
+        self.order_count -= 1
+    
+    def __iter__(self) -> Iterator[Order]:
+        """Iterate in time priority; the order just yielded may be unlinked meanwhile."""
+        order = self.head
+        while order is not None:
+            next_order = order.next_in_level
+            yield order
+            order = next_order
 
 class OrderBook:
     """
-    High-performance order book implementation using red-black tree.
+    High-performance order book keeping each side in its own sorted map.
     
     Features:
     - O(log n) insertion, deletion, and search operations
@@ -41,346 +81,182 @@ class OrderBook:
     
     def __init__(self, symbol: str):
         self.symbol = symbol
-        self.root: Optional[OrderBookNode] = None
-        self.bids: Optional[OrderBookNode] = None  # Highest bid
-        self.asks: Optional[OrderBookNode] = None  # Lowest ask
+        # Price levels keyed by price in ticks, ascending on both sides
+        self.bid_levels: SortedDict = SortedDict()
+        self.ask_levels: SortedDict = SortedDict()
+        # Both sides indexed by OrderSide value; a SortedDict is also a plain
+        # dict, so finding an existing level is one hash lookup
+        self._sides = (self.bid_levels, self.ask_levels)
+        self.bids: Optional[PriceLevel] = None  # Highest bid
+        self.asks: Optional[PriceLevel] = None  # Lowest ask
         self.order_count = 0
         self.total_orders = 0
-        
-    def _is_red(self, node: Optional[OrderBookNode]) -> bool:
-        """Check if node is red."""
-        return node is not None and node.color == Color.RED
-    
-    def _rotate_left(self, node: OrderBookNode) -> OrderBookNode:
-        """Left rotation for red-black tree balancing."""
-        right_child = node.right
-        node.right = right_child.left
-        
-        if right_child.left:
-            right_child.left.parent = node
-        
-        right_child.parent = node.parent
-        
-        if not node.parent:
-            self.root = right_child
-        elif node == node.parent.left:
-            node.parent.left = right_child
-        else:
-            node.parent.right = right_child
-        
-        right_child.left = node
-        node.parent = right_child
-        
-        return right_child
-    
-    def _rotate_right(self, node: OrderBookNode) -> OrderBookNode:
-        """Right rotation for red-black tree balancing."""
-        left_child = node.left
-        node.left = left_child.right
-        
-        if left_child.right:
-            left_child.right.parent = node
-        
-        left_child.parent = node.parent
-        
-        if not node.parent:
-            self.root = left_child
-        elif node == node.parent.right:
-            node.parent.right = left_child
-        else:
-            node.parent.left = left_child
-        
-        left_child.right = node
-        node.parent = left_child
-        
-        return left_child
-    
-    def _fix_insertion(self, node: OrderBookNode) -> None:
-        """Fix red-black tree properties after insertion."""
-        while node != self.root and self._is_red(node.parent):
-            if node.parent == node.parent.parent.left:
-                uncle = node.parent.parent.right
-                if self._is_red(uncle):
-                    # Case 1: Uncle is red
-                    node.parent.color = Color.BLACK
-                    uncle.color = Color.BLACK
-                    node.parent.parent.color = Color.RED
-                    node = node.parent.parent
-                else:
-                    # Case 2: Uncle is black, node is right child
-                    if node == node.parent.right:
-                        node = node.parent
-                        self._rotate_left(node)
-                    # Case 3: Uncle is black, node is left child
-                    node.parent.color = Color.BLACK
-                    node.parent.parent.color = Color.RED
-                    self._rotate_right(node.parent.parent)
-            else:
-                uncle = node.parent.parent.left
-                if self._is_red(uncle):
-                    # Case 1: Uncle is red
-                    node.parent.color = Color.BLACK
-                    uncle.color = Color.BLACK
-                    node.parent.parent.color = Color.RED
-                    node = node.parent.parent
-                else:
-                    # Case 2: Uncle is black, node is left child
-                    if node == node.parent.left:
-                        node = node.parent
-                        self._rotate_right(node)
-                    # Case 3: Uncle is black, node is right child
-                    node.parent.color = Color.BLACK
-                    node.parent.parent.color = Color.RED
-                    self._rotate_left(node.parent.parent)
-        
-        self.root.color = Color.BLACK
-    
-    def _find_node(self, price: Decimal) -> Optional[OrderBookNode]:
-        """Find node with specific price."""
-        node = self.root
-        while node:
-            if price == node.price:
-                return node
-            elif price < node.price:
-                node = node.left
-            else:
-                node = node.right
-        return None
-    
-    def _find_min(self, node: Optional[OrderBookNode] = None) -> Optional[OrderBookNode]:
-        """Find minimum node in subtree."""
-        if node is None:
-            node = self.root
-        
-        while node and node.left:
-            node = node.left
-        return node
-    
-    def _find_max(self, node: Optional[OrderBookNode] = None) -> Optional[OrderBookNode]:
-        """Find maximum node in subtree."""
-        if node is None:
-            node = self.root
-        
-        while node and node.right:
-            node = node.right
-        return node
-    
-    def _find_successor(self, price: Decimal) -> Optional[OrderBookNode]:
-        """Find successor node (next higher price)."""
-        node = self.root
-        successor = None
-        
-        while node:
-            if price < node.price:
-                successor = node
-                node = node.left
-            else:
-                node = node.right
-        
-        return successor
-    
-    def _find_predecessor(self, price: Decimal) -> Optional[OrderBookNode]:
-        """Find predecessor node (next lower price)."""
-        node = self.root
-        predecessor = None
-        
-        while node:
-            if price > node.price:
-                predecessor = node
-                node = node.right
-            else:
-                node = node.left
-        
-        return predecessor
+        # Read views rebuilt lazily after the book changes
+        self._bbo_cache: Optional[BestBidOffer] = None
+        self._snapshot_cache: Dict[int, OrderBookSnapshot] = {}
+        # Emptied price levels, reused so level churn does not allocate
+        self._level_pool: List[PriceLevel] = []
+        # Resting orders by ID; membership tells remove_order what is on the book
+        self._order_index: Dict[str, Order] = {}
     
     def add_order(self, order: Order) -> bool:
         """Add order to the order book."""
-        if order.side not in [OrderSide.BUY, OrderSide.SELL]:
+        price = order.price_ticks
+        if price is None:
             return False
         
-        price = order.price
-        if price is None:
+        if order.side == OrderSide.BUY:
+            levels = self.bid_levels
+            improves = self.bids is None or price > self.bids.price
+        elif order.side == OrderSide.SELL:
+            levels = self.ask_levels
+            improves = self.asks is None or price < self.asks.price
+        else:
             return False
         
-        # Find existing node or create new one
-        node = self._find_node(price)
+        if order.order_id in self._order_index:
+            return False
+        self._order_index[order.order_id] = order
         
-        if node:
+        level = levels.get(price)
+        if level is not None:
             # Add to existing price level
-            node.orders.append(order)
-            node.total_quantity += order.remaining_quantity
+            level.total_quantity += order.remaining_lots
+        elif self._level_pool:
+            # Reuse an emptied price level
+            level = levels[price] = self._level_pool.pop()
+            level.price = price
+            level.total_quantity = order.remaining_lots
         else:
             # Create new price level
-            node = OrderBookNode(
-                price=price,
-                orders=deque([order]),
-                total_quantity=order.remaining_quantity
-            )
-            self._insert_node(node)
+            level = levels[price] = PriceLevel(price=price, total_quantity=order.remaining_lots)
+        level.append(order)
         
-        # Update best bid/ask
-        self._update_best_levels()
+        # Only a better price can move the best level
+        if improves:
+            if order.side == OrderSide.BUY:
+                self.bids = level
+            else:
+                self.asks = level
+        self._invalidate_views(level is self.bids or level is self.asks)
         
         self.order_count += 1
         self.total_orders += 1
         
         return True
     
-    def _insert_node(self, new_node: OrderBookNode) -> None:
-        """Insert new node into red-black tree."""
-        if not self.root:
-            self.root = new_node
-            new_node.color = Color.BLACK
-            return
-        
-        current = self.root
-        while current:
-            if new_node.price < current.price:
-                if current.left:
-                    current = current.left
-                else:
-                    current.left = new_node
-                    new_node.parent = current
-                    break
-            else:
-                if current.right:
-                    current = current.right
-                else:
-                    current.right = new_node
-                    new_node.parent = current
-                    break
-        
-        self._fix_insertion(new_node)
-    
     def remove_order(self, order: Order) -> bool:
         """Remove order from the order book."""
-        price = order.price
+        price = order.price_ticks
         if price is None:
             return False
         
-        node = self._find_node(price)
-        if not node:
+        order = self._order_index.pop(order.order_id, None)
+        if order is None:
             return False
         
-        try:
-            node.orders.remove(order)
-            node.total_quantity -= order.remaining_quantity
-            
-            # If no more orders at this price level, remove the node
-            if not node.orders:
-                self._delete_node(node)
-            
-            # Update best bid/ask
-            self._update_best_levels()
-            
-            self.order_count -= 1
-            return True
-            
-        except ValueError:
-            return False
+        levels = self._sides[order.side]
+        level = levels[price]
+        at_top = level is self.bids or level is self.asks
+        level.unlink(order)
+        level.total_quantity -= order.remaining_lots
+        
+        # If no more orders at this price level, remove it; only the
+        # side whose best level just emptied needs a new best
+        if not level.order_count:
+            del levels[price]
+            if level is self.bids:
+                self.bids = levels.peekitem(-1)[1] if levels else None
+            elif level is self.asks:
+                self.asks = levels.peekitem(0)[1] if levels else None
+            if len(self._level_pool) < LEVEL_POOL_SIZE:
+                self._level_pool.append(level)
+        
+        self._invalidate_views(at_top)
+        
+        self.order_count -= 1
+        return True
     
-    def _delete_node(self, node: OrderBookNode) -> None:
-        """Delete node from red-black tree."""
-        # Implementation of red-black tree deletion
-        # This is a complex operation that maintains tree properties
-        # For brevity, we'll implement a simplified version
-        
-        if not node.left and not node.right:
-            # Node has no children
-            if node == self.root:
-                self.root = None
-            elif node == node.parent.left:
-                node.parent.left = None
-            else:
-                node.parent.right = None
-        elif node.left and not node.right:
-            # Node has only left child
-            if node == self.root:
-                self.root = node.left
-            elif node == node.parent.left:
-                node.parent.left = node.left
-            else:
-                node.parent.right = node.left
-            node.left.parent = node.parent
-        elif node.right and not node.left:
-            # Node has only right child
-            if node == self.root:
-                self.root = node.right
-            elif node == node.parent.left:
-                node.parent.left = node.right
-            else:
-                node.parent.right = node.right
-            node.right.parent = node.parent
-        else:
-            # Node has two children - find successor
-            successor = self._find_min(node.right)
-            if successor:
-                node.price = successor.price
-                node.orders = successor.orders
-                node.total_quantity = successor.total_quantity
-                self._delete_node(successor)
+    def reduce_order(self, order: Order, quantity: int) -> None:
+        """Take a partial fill of a resting order off its price level's total."""
+        level = self._sides[order.side].get(order.price_ticks)
+        if level is not None:
+            level.total_quantity -= quantity
+            self._invalidate_views(level is self.bids or level is self.asks)
     
-    def _update_best_levels(self) -> None:
-        """Update best bid and ask levels."""
-        # For bids, we want the highest price
-        self.bids = self._find_max()
-        
-        # For asks, we want the lowest price
-        self.asks = self._find_min()
+    def _invalidate_views(self, top_changed: bool = True) -> None:
+        """
+        Drop cached read views after the book changed.
+        
+        Args:
+            top_changed: Whether a best level changed; the cached BBO
+                survives changes deeper in the book
+        """
+        if top_changed:
+            self._bbo_cache = None
+        if self._snapshot_cache:
+            self._snapshot_cache = {}
     
     def get_best_bid_offer(self) -> BestBidOffer:
-        """Get current best bid and offer."""
+        """Get current best bid and offer, cached until the book changes."""
+        bbo = self._bbo_cache
+        if bbo is None:
+            bbo = self._bbo_cache = self._build_best_bid_offer()
+        return bbo
+    
+    def _build_best_bid_offer(self) -> BestBidOffer:
+        """Build the best bid and offer from the best levels."""
         best_bid = None
         best_ask = None
         
         if self.bids:
             best_bid = OrderBookLevel(
-                price=self.bids.price,
-                quantity=self.bids.total_quantity,
-                order_count=len(self.bids.orders)
+                price_ticks=self.bids.price,
+                quantity_lots=self.bids.total_quantity,
+                order_count=self.bids.order_count
             )
         
         if self.asks:
             best_ask = OrderBookLevel(
-                price=self.asks.price,
-                quantity=self.asks.total_quantity,
-                order_count=len(self.asks.orders)
+                price_ticks=self.asks.price,
+                quantity_lots=self.asks.total_quantity,
+                order_count=self.asks.order_count
             )
         
         return BestBidOffer(
             symbol=self.symbol,
             best_bid=best_bid,
-            best_ask=best_ask
+            best_ask=best_ask,
+            best_bid_price=best_bid.price_ticks if best_bid else None,
+            best_ask_price=best_ask.price_ticks if best_ask else None
         )
     
     def get_order_book_snapshot(self, depth: int = 10) -> OrderBookSnapshot:
-        """Get order book snapshot with specified depth."""
-        bids = []
-        asks = []
-        
-        # Get top N bid levels
-        current = self.bids
-        bid_count = 0
-        while current and bid_count < depth:
-            bids.append(OrderBookLevel(
-                price=current.price,
-                quantity=current.total_quantity,
-                order_count=len(current.orders)
-            ))
-            current = self._find_predecessor(current.price)
-            bid_count += 1
-        
-        # Get top N ask levels
-        current = self.asks
-        ask_count = 0
-        while current and ask_count < depth:
-            asks.append(OrderBookLevel(
-                price=current.price,
-                quantity=current.total_quantity,
-                order_count=len(current.orders)
-            ))
-            current = self._find_successor(current.price)
-            ask_count += 1
+        """
+        Get order book snapshot with specified depth.
+        
+        Snapshots at the depths in SNAPSHOT_CACHE_DEPTHS are cached until
+        the book changes; depth is clamped to 0..MAX_ORDER_BOOK_LEVELS.
+        """
+        depth = max(0, min(depth, settings.MAX_ORDER_BOOK_LEVELS))
+        if depth not in SNAPSHOT_CACHE_DEPTHS:
+            return self._build_order_book_snapshot(depth)
+        snapshot = self._snapshot_cache.get(depth)
+        if snapshot is None:
+            snapshot = self._snapshot_cache[depth] = self._build_order_book_snapshot(depth)
+        return snapshot
+    
+    def _build_order_book_snapshot(self, depth: int) -> OrderBookSnapshot:
+        """Collect the top depth levels on each side."""
+        # Bids from the highest price down, asks from the lowest price up
+        bids = [
+            OrderBookLevel(price_ticks=level.price, quantity_lots=level.total_quantity, order_count=level.order_count)
+            for level in islice(reversed(self.bid_levels.values()), depth)
+        ]
+        asks = [
+            OrderBookLevel(price_ticks=level.price, quantity_lots=level.total_quantity, order_count=level.order_count)
+            for level in islice(self.ask_levels.values(), depth)
+        ]
         
         return OrderBookSnapshot(
             symbol=self.symbol,
@@ -388,37 +264,89 @@ class OrderBook:
             asks=asks
         )
     
-    def get_marketable_orders(self, side: OrderSide, max_price: Decimal) -> List[Order]:
+    def get_marketable_orders(self, side: OrderSide, max_price: int) -> List[Order]:
         """Get orders that can be matched at or better than max_price."""
-        orders = []
-        
+        return list(self.iter_marketable_orders(side, max_price))
+    
+    def iter_marketable_orders(self, side: OrderSide, max_price: int) -> Iterator[Order]:
+        """
+        Yield orders that can be matched at or better than max_price (in ticks).
+        
+        Levels are visited lazily in price-time priority, so a caller that
+        stops early never walks the deeper levels. The caller may remove
+        each order after it is yielded, e.g. once it is filled.
+        """
         if side == OrderSide.BUY:
             # For buy orders, we want asks at or below max_price
-            current = self.asks
-            while current and current.price <= max_price:
-                orders.extend(list(current.orders))
-                current = self._find_successor(current.price)
+            levels = self.ask_levels
+            level = self.asks
+            while level is not None and level.price <= max_price:
+                price = level.price
+                yield from level
+                best = self.asks
+                if best is not None and best.price > price:
+                    # The caller emptied the level, so the next one is the new best
+                    level = best
+                else:
+                    index = levels.bisect_right(price)
+                    level = levels[levels.keys()[index]] if index < len(levels) else None
         else:
             # For sell orders, we want bids at or above max_price
-            current = self.bids
-            while current and current.price >= max_price:
-                orders.extend(list(current.orders))
-                current = self._find_predecessor(current.price)
+            levels = self.bid_levels
+            level = self.bids
+            while level is not None and level.price >= max_price:
+                price = level.price
+                yield from level
+                best = self.bids
+                if best is not None and best.price < price:
+                    level = best
+                else:
+                    index = levels.bisect_left(price) - 1
+                    level = levels[levels.keys()[index]] if index >= 0 else None
+    
+    def available_quantity_up_to(self, side: OrderSide, max_price: int, needed: int) -> int:
+        """
+        Sum resting quantity marketable against max_price, stopping once needed is reached.
+        
+        Args:
+            side: Side of the incoming order
+            max_price: Worst acceptable price, in ticks
+            needed: Quantity in lots after which counting can stop
+        
+        Returns:
+            Available quantity in lots, capped early at the first total >= needed
+        """
+        if side == OrderSide.BUY:
+            levels = self.ask_levels
+            prices = levels.irange(maximum=max_price)
+        else:
+            levels = self.bid_levels
+            prices = levels.irange(minimum=max_price, reverse=True)
+        
+        available = 0
+        for price in prices:
+            for resting_order in levels[price]:
+                available += resting_order.remaining_lots
+                if available >= needed:
+                    return available
         
-        return orders
+        return available
     
     def get_total_orders(self) -> int:
         """Get total number of active orders."""
         return self.order_count
     
-    def get_total_quantity_at_price(self, price: Decimal) -> Decimal:
-        """Get total quantity at specific price level."""
-        node = self._find_node(price)
-        return node.total_quantity if node else Decimal('0')
+    def get_total_quantity_at_price(self, price: int) -> int:
+        """Get total quantity in lots at a price level given in ticks."""
+        level = self.bid_levels.get(price) or self.ask_levels.get(price)
+        return level.total_quantity if level else 0
     
     def clear(self) -> None:
         """Clear all orders from the order book."""
-        self.root = None
+        self.bid_levels.clear()
+        self.ask_levels.clear()
+        self._order_index.clear()
         self.bids = None
         self.asks = None
         self.order_count = 0
+        self._invalidate_views()
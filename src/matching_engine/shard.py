@@ -0,0 +1,252 @@
+"""
+Per-symbol command sequencing for the matching engine.
+Each symbol's book is owned by a single worker that applies commands in arrival order.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import queue
+import threading
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from src.matching_engine.order_book import OrderBook
+from src.models.order import BestBidOffer, TradeExecution
+
+logger = logging.getLogger(__name__)
+
+# A command returns (result, fills, book_changed); the last two drive publishing
+CommandOutcome = Tuple[Any, List[TradeExecution], bool]
+Command = Callable[..., CommandOutcome]
+# Publishing gets the fills and, when the book changed, its BBO right after the command
+Publisher = Callable[[List[TradeExecution], Optional[BestBidOffer]], Awaitable[None]]
+AppliedOutcome = Tuple[Any, List[TradeExecution], Optional[BestBidOffer]]
+
+# Trade IDs carry the shard ID above this many bits of sequence number
+TRADE_SEQUENCE_BITS = 48
+
+class ShardWorker:
+    """
+    Single consumer of the command queue for one symbol and owner of its book.
+    
+    Commands for the same symbol are applied strictly one after another, so
+    the book needs no lock; commands for different symbols never wait on
+    each other. Commands are synchronous; their trades and book changes are
+    published on the event loop before the next command runs.
+    """
+    
+    def __init__(self, symbol: str, order_book: OrderBook, publish: Publisher, shard_id: int = 0):
+        self.symbol = symbol
+        self.order_book = order_book
+        self.shard_id = shard_id
+        self._publish = publish
+        # Monotonic trade IDs, unique across shards: (shard_id << 48) | sequence
+        self.next_trade_id = itertools.count((shard_id << TRADE_SEQUENCE_BITS) + 1).__next__
+        self._commands: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the worker task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"shard-{self.symbol}")
+    
+    async def stop(self) -> None:
+        """Stop the worker and fail any commands still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        while not self._commands.empty():
+            _, _, future = self._commands.get_nowait()
+            _set_exception(future, RuntimeError(f"Shard {self.symbol} stopped"))
+    
+    async def submit(self, command: Command, *args: Any) -> Any:
+        """
+        Queue a command for this shard and wait for its result.
+        
+        Args:
+            command: Function applied to the shard's book
+            *args: Arguments for the command
+        
+        Returns:
+            The result part of the command's outcome
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._commands.put_nowait((command, args, future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Apply queued commands one at a time."""
+        while True:
+            command, args, future = await self._commands.get()
+            if future.cancelled():
+                continue
+            try:
+                outcome = self._apply(command, args)
+            except Exception as e:
+                logger.error("Error processing command for %s: %s", self.symbol, e)
+                _set_exception(future, e)
+            else:
+                await self._finish(future, outcome)
+    
+    async def read(self, query: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a read-only query against the shard's book.
+        
+        The event loop owns this shard's book, so the query runs right away.
+        
+        Args:
+            query: Function reading the shard's book
+            *args: Arguments for the query
+        
+        Returns:
+            The query's result
+        """
+        return query(*args)
+    
+    def best_bid_offer(self) -> BestBidOffer:
+        """Get the current BBO of the shard's book."""
+        return self.order_book.get_best_bid_offer()
+    
+    def _apply(self, command: Command, args: Tuple[Any, ...]) -> AppliedOutcome:
+        """Apply a command, capturing the book's BBO when the command changed it."""
+        result, fills, book_changed = command(*args)
+        return result, fills, self.order_book.get_best_bid_offer() if book_changed else None
+    
+    async def _finish(self, future: asyncio.Future, outcome: AppliedOutcome) -> None:
+        """
+        Publish a command's effects, then hand its result to the caller.
+        
+        The command has already been applied, so a publishing failure is
+        logged and the caller still gets its result; the worker keeps going.
+        """
+        result, fills, bbo = outcome
+        if fills or bbo is not None:
+            try:
+                await self._publish(fills, bbo)
+            except Exception as e:
+                logger.error("Error publishing updates for %s: %s", self.symbol, e)
+        if not future.done():
+            future.set_result(result)
+
+class ThreadedShardWorker(ShardWorker):
+    """
+    Shard that applies its commands on a dedicated, optionally CPU-pinned thread.
+    
+    Publishing still happens on the event loop. Matching is pure Python, so
+    shard threads overlap with the loop's I/O but not with each other under
+    the GIL; this mode is opt-in through settings.SHARD_THREADS.
+    
+    Only the shard thread touches the book. It captures the BBO after each
+    command, and reads from the loop either use that BBO or run on the
+    thread in turn with the commands, so the loop never waits on a lock.
+    """
+    
+    def __init__(self, symbol: str, order_book: OrderBook, publish: Publisher, shard_id: int = 0,
+                 cpu: Optional[int] = None):
+        super().__init__(symbol, order_book, publish, shard_id)
+        self.cpu = cpu
+        # BBO as of the last command applied; replaced whole, so the loop can read it any time
+        self.bbo = order_book.get_best_bid_offer()
+        self._commands: queue.SimpleQueue = queue.SimpleQueue()
+        # Applied commands waiting to be published, in the order the thread applied them
+        self._applied: asyncio.Queue = asyncio.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def start(self) -> None:
+        """Start the worker thread, delivering results to the running event loop."""
+        if self._thread is None or not self._thread.is_alive():
+            self._loop = asyncio.get_running_loop()
+            self._publisher = asyncio.create_task(self._run_publisher(), name=f"shard-{self.symbol}-publish")
+            self._thread = threading.Thread(target=self._run_thread, name=f"shard-{self.symbol}", daemon=True)
+            self._thread.start()
+    
+    async def stop(self) -> None:
+        """Stop the worker thread, publish what it applied, and fail any commands still queued."""
+        if self._thread is not None:
+            self._commands.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+        
+        # The thread handed over its last outcomes before the join returned
+        if self._publisher is not None:
+            await self._applied.join()
+            self._publisher.cancel()
+            try:
+                await self._publisher
+            except asyncio.CancelledError:
+                pass
+            self._publisher = None
+        
+        while not self._commands.empty():
+            item = self._commands.get_nowait()
+            if item is not None:
+                _set_exception(item[2], RuntimeError(f"Shard {self.symbol} stopped"))
+    
+    async def submit(self, command: Command, *args: Any) -> Any:
+        """Queue a command for the shard thread and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._commands.put((command, args, future))
+        return await future
+    
+    async def read(self, query: Callable[..., Any], *args: Any) -> Any:
+        """Run a read-only query on the shard thread, after the commands queued before it."""
+        return await self.submit(_read_only, query, *args)
+    
+    def best_bid_offer(self) -> BestBidOffer:
+        """Get the BBO captured after the last command, without touching the book."""
+        return self.bbo
+    
+    def _apply(self, command: Command, args: Tuple[Any, ...]) -> AppliedOutcome:
+        """Apply a command on the shard thread and publish its BBO for loop-side reads."""
+        outcome = super()._apply(command, args)
+        if outcome[2] is not None:
+            self.bbo = outcome[2]
+        return outcome
+    
+    def _run_thread(self) -> None:
+        """Apply queued commands one at a time on this thread."""
+        if self.cpu is not None and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, {self.cpu})
+            except OSError as e:
+                logger.warning("Could not pin shard %s to CPU %s: %s", self.symbol, self.cpu, e)
+        
+        loop = self._loop
+        while True:
+            item = self._commands.get()
+            if item is None:
+                return
+            command, args, future = item
+            try:
+                outcome = self._apply(command, args)
+            except Exception as e:
+                logger.error("Error processing command for %s: %s", self.symbol, e)
+                loop.call_soon_threadsafe(_set_exception, future, e)
+            else:
+                loop.call_soon_threadsafe(self._applied.put_nowait, (future, outcome))
+    
+    async def _run_publisher(self) -> None:
+        """Publish applied commands on the event loop, one after another in command order."""
+        while True:
+            future, outcome = await self._applied.get()
+            try:
+                await self._finish(future, outcome)
+            finally:
+                self._applied.task_done()
+
+def _read_only(query: Callable[..., Any], *args: Any) -> CommandOutcome:
+    """Run a query as a command that publishes nothing."""
+    return query(*args), [], False
+
+def _set_exception(future: asyncio.Future, exc: Exception) -> None:
+    """Fail a future unless its caller already gave up on it."""
+    if not future.done():
+        future.set_exception(exc)
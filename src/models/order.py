@@ -2,17 +2,87 @@
 Order models and data structures for the matching engine.
 """
 
-from enum import Enum
-from typing import Optional, Dict, Any
-from datetime import datetime
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping
+from datetime import datetime, timezone
 from decimal import Decimal
-from pydantic import BaseModel, Field, validator
-import uuid
+from pydantic import BaseModel, validator
+import itertools
+import os
+import socket
+import sys
+import time
 
-class OrderSide(str, Enum):
-    """Order side enumeration."""
-    BUY = "buy"
-    SELL = "sell"
+from src.config import settings
+
+FIXED_POINT_SCALE = settings.FIXED_POINT_SCALE
+_FRACTION_DIGITS = settings.ORDER_BOOK_PRECISION
+# Largest decimal exponent of any accepted price or size; anything beyond is
+# rejected before it is expanded into a (possibly enormous) integer
+_MAX_ADJUSTED = Decimal(str(max(settings.MAX_PRICE, settings.MAX_ORDER_SIZE))).adjusted()
+
+# Order IDs are a per-process prefix plus a counter: unique across hosts,
+# processes and restarts without a random read per order
+_ORDER_ID_PREFIX = f"{socket.gethostname()[:8]}-{os.getpid():x}-{int(time.time()):x}-"
+_next_order_number = itertools.count(1).__next__
+
+def _new_order_id() -> str:
+    """Generate the next order ID for this process."""
+    return f"{_ORDER_ID_PREFIX}{_next_order_number():x}"
+
+def to_fixed(value: Decimal) -> int:
+    """
+    Convert a Decimal price or quantity to integer fixed-point units.
+    
+    Raises:
+        ValueError: If the value is not finite, is far above the configured
+            maximums, or has more than ORDER_BOOK_PRECISION decimal places
+    """
+    # Cheap exponent checks first: the integer ratio of a value like 1e-30000000
+    # takes seconds to build
+    if not value.is_finite():
+        raise ValueError(f"Not a finite number: {value}")
+    if value:
+        if value.adjusted() > _MAX_ADJUSTED:
+            raise ValueError(f"Value out of range: {value}")
+        # Below 1e-8 always needs more places; checking it here also keeps
+        # normalize() clear of underflow, which would round the value to zero
+        if value.adjusted() < -_FRACTION_DIGITS or value.normalize().as_tuple().exponent < -_FRACTION_DIGITS:
+            raise ValueError(f"More than {_FRACTION_DIGITS} decimal places: {value}")
+    
+    # Exact integer rescale: no Decimal arithmetic, so no context rounding
+    numerator, denominator = value.as_integer_ratio()
+    factor, rest = divmod(FIXED_POINT_SCALE, denominator)
+    if rest:
+        # Truncating would book a different price or size than was submitted
+        raise ValueError(f"More than {_FRACTION_DIGITS} decimal places: {value}")
+    return numerator * factor
+
+# Book prices and sizes repeat heavily, so most formatting is a cache hit
+@lru_cache(maxsize=65536)
+def format_fixed(value: int) -> str:
+    """Format fixed-point units as a decimal string, e.g. 150000000 -> "1.5"."""
+    whole, fraction = divmod(abs(value), FIXED_POINT_SCALE)
+    sign = "-" if value < 0 else ""
+    return f"{sign}{whole}.{str(fraction).zfill(_FRACTION_DIGITS).rstrip('0') or '0'}"
+
+# All fills of one match share a timestamp, so a sweep formats it once
+_format_timestamp = lru_cache(maxsize=1024)(datetime.isoformat)
+
+def from_fixed(value: int) -> Decimal:
+    """Convert integer fixed-point units back to a Decimal."""
+    return Decimal(format_fixed(value))
+
+class OrderSide(IntEnum):
+    """Order side enumeration; integer-valued so side checks are int compares."""
+    BUY = 0
+    SELL = 1
+
+# Wire names of the sides, indexed by OrderSide
+SIDE_NAMES = ("buy", "sell")
 
 class OrderType(str, Enum):
     """Order type enumeration."""
@@ -29,28 +99,28 @@ class OrderStatus(str, Enum):
     CANCELLED = "cancelled"
     REJECTED = "rejected"
 
-class Order(BaseModel):
-    """Order model representing a trading order."""
+class OrderIn(BaseModel):
+    """Validated order request, converted to an engine Order at the API boundary."""
     
-    order_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     symbol: str
     side: OrderSide
     order_type: OrderType
     quantity: Decimal
     price: Optional[Decimal] = None
-    filled_quantity: Decimal = Field(default=Decimal('0'))
-    remaining_quantity: Decimal = Field(default=Decimal('0'))
-    status: OrderStatus = Field(default=OrderStatus.PENDING)
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
     user_id: Optional[str] = None
     
+    @validator('symbol')
+    def intern_symbol(cls, v):
+        # Interned symbols hash and compare by identity in the engine's dict lookups
+        return sys.intern(v)
+    
     @validator('quantity')
     def validate_quantity(cls, v):
         if v <= 0:
             raise ValueError('Quantity must be positive')
         return v
     
-    @validator('price')
+    @validator('price', always=True)
     def validate_price(cls, v, values):
         if v is not None and v <= 0:
             raise ValueError('Price must be positive')
@@ -58,54 +128,89 @@ class Order(BaseModel):
             raise ValueError('Price is required for limit orders')
         return v
     
-    @validator('remaining_quantity', always=True)
-    def set_remaining_quantity(cls, v, values):
-        if 'quantity' in values and 'filled_quantity' in values:
-            return values['quantity'] - values['filled_quantity']
-        return v
+    def to_order(self) -> 'Order':
+        """Build the engine order for this request."""
+        return Order(
+            symbol=self.symbol,
+            side=self.side,
+            order_type=self.order_type,
+            quantity=self.quantity,
+            price=self.price,
+            user_id=self.user_id
+        )
+
+@dataclass(slots=True, kw_only=True, eq=False)
+class Order:
+    """
+    Order model representing a trading order.
     
-    def is_marketable(self, best_bid: Optional[Decimal], best_ask: Optional[Decimal]) -> bool:
-        """Check if order is marketable (can be filled immediately)."""
-        if self.order_type == OrderType.MARKET:
-            return True
-        
-        if self.order_type in [OrderType.IOC, OrderType.FOK]:
-            if self.price is None:
-                return False
-            if self.side == OrderSide.BUY and best_ask and self.price >= best_ask:
-                return True
-            if self.side == OrderSide.SELL and best_bid and self.price <= best_bid:
-                return True
-        
-        return False
+    A plain slotted object without validation: requests are validated once
+    by OrderIn, and the engine range-checks the fixed-point values.
+    Orders compare by identity.
+    """
+    
+    order_id: str = field(default_factory=_new_order_id)
+    symbol: str
+    side: OrderSide
+    order_type: OrderType
+    quantity: Decimal
+    price: Optional[Decimal] = None
+    status: OrderStatus = OrderStatus.PENDING
+    # Creation time in nanoseconds since the epoch
+    timestamp: int = field(default_factory=time.time_ns)
+    user_id: Optional[str] = None
+    # Fixed-point mirrors of price and quantity; the engine only uses these
+    price_ticks: Optional[int] = field(init=False)
+    quantity_lots: int = field(init=False)
+    filled_lots: int = field(init=False, default=0)
+    remaining_lots: int = field(init=False)
+    # Neighbours in its price level's queue while resting, maintained by the order book
+    prev_in_level: Optional['Order'] = field(init=False, default=None, repr=False)
+    next_in_level: Optional['Order'] = field(init=False, default=None, repr=False)
+    
+    def __post_init__(self):
+        self.price_ticks = to_fixed(self.price) if self.price is not None else None
+        self.quantity_lots = self.remaining_lots = to_fixed(self.quantity)
+    
+    @property
+    def filled_quantity(self) -> Decimal:
+        return from_fixed(self.filled_lots)
+    
+    @property
+    def remaining_quantity(self) -> Decimal:
+        return from_fixed(self.remaining_lots)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert order to dictionary."""
         return {
             'order_id': self.order_id,
             'symbol': self.symbol,
-            'side': self.side.value,
+            'side': SIDE_NAMES[self.side],
             'order_type': self.order_type.value,
-            'quantity': str(self.quantity),
-            'price': str(self.price) if self.price else None,
-            'filled_quantity': str(self.filled_quantity),
-            'remaining_quantity': str(self.remaining_quantity),
+            'quantity': format_fixed(self.quantity_lots),
+            'price': format_fixed(self.price_ticks) if self.price_ticks is not None else None,
+            'filled_quantity': format_fixed(self.filled_lots),
+            'remaining_quantity': format_fixed(self.remaining_lots),
             'status': self.status.value,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': datetime.fromtimestamp(self.timestamp / 1e9, tz=timezone.utc).replace(tzinfo=None).isoformat(),
             'user_id': self.user_id
         }
 
-class TradeExecution(BaseModel):
+# Engine-built output models are plain slotted dataclasses: their fields come
+# from already validated orders, so they skip validation and per-instance __dict__
+@dataclass(slots=True, kw_only=True)
+class TradeExecution:
     """Trade execution model representing a completed trade."""
     
-    trade_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    # Assigned by the executing shard from its monotonic sequence
+    trade_id: str
     symbol: str
-    price: Decimal
-    quantity: Decimal
+    price_ticks: int
+    quantity_lots: int
     aggressor_side: OrderSide
     maker_order_id: str
     taker_order_id: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = field(default_factory=datetime.utcnow)
     fee: Optional[Decimal] = None
     
     def to_dict(self) -> Dict[str, Any]:
@@ -113,60 +218,91 @@ class TradeExecution(BaseModel):
         return {
             'trade_id': self.trade_id,
             'symbol': self.symbol,
-            'price': str(self.price),
-            'quantity': str(self.quantity),
-            'aggressor_side': self.aggressor_side.value,
+            'price': format_fixed(self.price_ticks),
+            'quantity': format_fixed(self.quantity_lots),
+            'aggressor_side': SIDE_NAMES[self.aggressor_side],
             'maker_order_id': self.maker_order_id,
             'taker_order_id': self.taker_order_id,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': _format_timestamp(self.timestamp),
             'fee': str(self.fee) if self.fee else None
         }
 
-class OrderBookLevel(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class OrderBookLevel:
     """Order book level representing price and quantity at a specific price."""
     
-    price: Decimal
-    quantity: Decimal
+    price_ticks: int
+    quantity_lots: int
     order_count: int = 1
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert order book level to dictionary."""
         return {
-            'price': str(self.price),
-            'quantity': str(self.quantity),
+            'price': format_fixed(self.price_ticks),
+            'quantity': format_fixed(self.quantity_lots),
             'order_count': self.order_count
         }
 
-class BestBidOffer(BaseModel):
+def _read_only_level(level: OrderBookLevel) -> Mapping[str, Any]:
+    """Build a read-only dictionary of a level for the shared, cached book views."""
+    return MappingProxyType(level.to_dict())
+
+@dataclass(slots=True, kw_only=True)
+class BestBidOffer:
     """Best Bid and Offer (BBO) model."""
     
     symbol: str
     best_bid: Optional[OrderBookLevel] = None
     best_ask: Optional[OrderBookLevel] = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+    # Best prices in ticks, None for an empty side; saves the engine the level lookups
+    best_bid_price: Optional[int] = None
+    best_ask_price: Optional[int] = None
+    # The book reuses one BBO until it changes, so its dictionary is built once
+    _dict: Optional[Mapping[str, Any]] = field(default=None, init=False, repr=False, compare=False)
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert BBO to dictionary."""
-        return {
-            'symbol': self.symbol,
-            'best_bid': self.best_bid.to_dict() if self.best_bid else None,
-            'best_ask': self.best_ask.to_dict() if self.best_ask else None,
-            'timestamp': self.timestamp.isoformat()
-        }
+    def to_dict(self) -> Mapping[str, Any]:
+        """
+        Convert BBO to a read-only dictionary, built on first use and shared afterwards.
+        
+        Every reader gets the same mapping, so it cannot be modified; copy it
+        with dict() to change it. Its 'timestamp' is when this BBO was built,
+        right after the book last changed, not when it was read.
+        """
+        data = self._dict
+        if data is None:
+            data = self._dict = MappingProxyType({
+                'symbol': self.symbol,
+                'best_bid': _read_only_level(self.best_bid) if self.best_bid else None,
+                'best_ask': _read_only_level(self.best_ask) if self.best_ask else None,
+                'timestamp': self.timestamp.isoformat()
+            })
+        return data
 
-class OrderBookSnapshot(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class OrderBookSnapshot:
     """Complete order book snapshot."""
     
     symbol: str
-    bids: list[OrderBookLevel] = Field(default_factory=list)
-    asks: list[OrderBookLevel] = Field(default_factory=list)
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    bids: list[OrderBookLevel] = field(default_factory=list)
+    asks: list[OrderBookLevel] = field(default_factory=list)
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+    # Snapshots are cached per depth until the book changes, like the BBO
+    _dict: Optional[Mapping[str, Any]] = field(default=None, init=False, repr=False, compare=False)
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert order book snapshot to dictionary."""
-        return {
-            'symbol': self.symbol,
-            'bids': [level.to_dict() for level in self.bids],
-            'asks': [level.to_dict() for level in self.asks],
-            'timestamp': self.timestamp.isoformat()
-        }
+    def to_dict(self) -> Mapping[str, Any]:
+        """
+        Convert order book snapshot to a read-only dictionary, built on first use and shared afterwards.
+        
+        As with the BBO, readers share the mapping and its 'timestamp' is
+        when the snapshot was built, not when it was read.
+        """
+        data = self._dict
+        if data is None:
+            data = self._dict = MappingProxyType({
+                'symbol': self.symbol,
+                'bids': tuple(_read_only_level(level) for level in self.bids),
+                'asks': tuple(_read_only_level(level) for level in self.asks),
+                'timestamp': self.timestamp.isoformat()
+            })
+        return data
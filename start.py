@@ -5,10 +5,10 @@ This script provides easy startup and testing of the matching engine.
 """
 
 import asyncio
+import http.client
 import subprocess
 import sys
 import time
-import requests
 from pathlib import Path
 
 def check_dependencies():
@@ -48,19 +48,38 @@ def start_server():
         return False
     return True
 
+def wait_for_server(host="localhost", port=8000, timeout=10.0):
+    """
+    Poll the health endpoint until the server answers or timeout expires.
+    
+    Returns:
+        Status code of the first response, or None if the server never answered
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        connection = http.client.HTTPConnection(host, port, timeout=0.2)
+        try:
+            connection.request("GET", "/health")
+            return connection.getresponse().status
+        except (OSError, http.client.HTTPException):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+        finally:
+            connection.close()
+
 def test_server():
     """Test if the server is running and responding."""
     print("Testing server connection...")
-    try:
-        response = requests.get("http://localhost:8000/health", timeout=5)
-        if response.status_code == 200:
-            print("✓ Server is running and healthy")
-            return True
-        else:
-            print(f"✗ Server returned status code: {response.status_code}")
-            return False
-    except requests.exceptions.RequestException as e:
-        print(f"✗ Cannot connect to server: {e}")
+    status = wait_for_server(timeout=5)
+    if status == 200:
+        print("✓ Server is running and healthy")
+        return True
+    elif status is None:
+        print("✗ Cannot connect to server at localhost:8000")
+        return False
+    else:
+        print(f"✗ Server returned status code: {status}")
         return False
 
 def run_tests():
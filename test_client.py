@@ -4,73 +4,138 @@ This client demonstrates order submission, market data streaming, and trade exec
 """
 
 import asyncio
-import json
+import aiohttp
+import orjson
 import websockets
-import requests
 from decimal import Decimal
 from datetime import datetime
 import random
 
+def _pretty(data) -> str:
+    """Format a JSON payload for display."""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+
+# Feeds are small, frequent JSON frames on a local link: skip deflate, allow large snapshots
+WS_CONNECT_OPTIONS = {"compression": None, "max_size": 2**22}
+
 class MatchingEngineClient:
     """Client for interacting with the GoQuant Matching Engine."""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", pretty: bool = False):
         self.base_url = base_url
+        self._orders_url = f"{base_url}/api/v1/orders"
+        # Pretty-print streamed frames; parsing and re-formatting each one costs CPU
+        self.pretty = pretty
         self.ws_market_data = None
         self.ws_trades = None
+        self._session = None
+        self._batch_supported = True
+        self._listeners = []
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session; keeps connections alive across requests."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30)
+            )
+        return self._session
+    
+    def start_listeners(self, symbol: str):
+        """Start printing both feeds in the background, unless already started."""
+        if not self._listeners:
+            self._listeners = [
+                asyncio.create_task(self.listen_market_data(symbol)),
+                asyncio.create_task(self.listen_trades(symbol)),
+            ]
+    
+    async def close(self):
+        """Stop the feed listeners and close the HTTP session and WebSocket connections."""
+        for task in self._listeners:
+            task.cancel()
+        await asyncio.gather(*self._listeners, return_exceptions=True)
+        self._listeners = []
+        if self._session is not None:
+            await self._session.close()
+        for ws in (self.ws_market_data, self.ws_trades):
+            if ws is not None:
+                await ws.close()
+    
+    async def get_health(self):
+        """Get system health status."""
+        async with self.session.get(f"{self.base_url}/health") as response:
+            return await response.json(loads=orjson.loads)
     
     async def submit_order(self, symbol: str, side: str, order_type: str, quantity: str, price: str = None, user_id: str = None): # type: ignore
         """Submit an order to the matching engine."""
-        url = f"{self.base_url}/api/v1/orders"
-        data = {
-            "symbol": symbol,
-            "side": side,
-            "order_type": order_type,
-            "quantity": quantity,
-            "price": price,
-            "user_id": user_id
-        }
+        # Build the payload directly; most demo orders carry no price
+        if price is None:
+            data = {"symbol": symbol, "side": side, "order_type": order_type, "quantity": quantity}
+        else:
+            data = {"symbol": symbol, "side": side, "order_type": order_type, "quantity": quantity, "price": price}
+        if user_id is not None:
+            data["user_id"] = user_id
+        
+        async with self.session.post(self._orders_url, params=data) as response:
+            return await response.json(loads=orjson.loads)
+    
+    async def submit_orders_batch(self, orders: list):
+        """
+        Submit several orders in one request.
+        
+        Args:
+            orders: Order field dicts, as taken by submit_order
         
-        # Remove None values
-        data = {k: v for k, v in data.items() if v is not None}
+        Returns:
+            One submission result per order, in the order given
+        """
+        if self._batch_supported:
+            url = f"{self.base_url}/api/v1/orders/batch"
+            # The batch endpoint accepts null for optional fields, so orders go out as given
+            async with self.session.post(
+                url, data=orjson.dumps(orders), headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status not in (404, 405):
+                    return await response.json(loads=orjson.loads)
+            # Older server without the batch endpoint
+            self._batch_supported = False
         
-        response = requests.post(url, params=data)
-        return response.json()
+        return await asyncio.gather(*(self.submit_order(**order) for order in orders))
     
     async def get_order(self, order_id: str):
         """Get order details by ID."""
         url = f"{self.base_url}/api/v1/orders/{order_id}"
-        response = requests.get(url)
-        return response.json()
+        async with self.session.get(url) as response:
+            return await response.json(loads=orjson.loads)
     
     async def cancel_order(self, order_id: str):
         """Cancel an order."""
         url = f"{self.base_url}/api/v1/orders/{order_id}"
-        response = requests.delete(url)
-        return response.json()
+        async with self.session.delete(url) as response:
+            return await response.json(loads=orjson.loads)
     
     async def get_best_bid_offer(self, symbol: str):
         """Get current best bid and offer."""
         url = f"{self.base_url}/api/v1/market-data/{symbol}/bbo"
-        response = requests.get(url)
-        return response.json()
+        async with self.session.get(url) as response:
+            return await response.json(loads=orjson.loads)
     
     async def get_order_book(self, symbol: str, depth: int = 10):
         """Get order book snapshot."""
         url = f"{self.base_url}/api/v1/market-data/{symbol}/orderbook"
-        response = requests.get(url, params={"depth": depth})
-        return response.json()
+        async with self.session.get(url, params={"depth": depth}) as response:
+            return await response.json(loads=orjson.loads)
     
     async def connect_market_data(self, symbol: str):
         """Connect to market data WebSocket."""
         uri = f"ws://localhost:8000/api/v1/ws/market-data/{symbol}"
-        self.ws_market_data = await websockets.connect(uri)
+        self.ws_market_data = await websockets.connect(uri, **WS_CONNECT_OPTIONS)
         return self.ws_market_data
     
     async def connect_trades(self, symbol: str):
         """Connect to trade execution WebSocket."""
         uri = f"ws://localhost:8000/api/v1/ws/trades/{symbol}"
-        self.ws_trades = await websockets.connect(uri)
+        self.ws_trades = await websockets.connect(uri, **WS_CONNECT_OPTIONS)
         return self.ws_trades
     
     async def listen_market_data(self, symbol: str):
@@ -80,8 +145,10 @@ class MatchingEngineClient:
         
         try:
             async for message in self.ws_market_data: # type: ignore
-                data = json.loads(message)
-                print(f"Market Data Update: {json.dumps(data, indent=2)}")
+                if self.pretty:
+                    print(f"Market Data Update: {_pretty(orjson.loads(message))}")
+                else:
+                    print(f"Market Data Update: {message}")
         except websockets.exceptions.ConnectionClosed:
             print("Market data connection closed")
     
@@ -92,22 +159,23 @@ class MatchingEngineClient:
         
         try:
             async for message in self.ws_trades: # type: ignore
-                data = json.loads(message)
-                print(f"Trade Execution: {json.dumps(data, indent=2)}")
+                if self.pretty:
+                    print(f"Trade Execution: {_pretty(orjson.loads(message))}")
+                else:
+                    print(f"Trade Execution: {message}")
         except websockets.exceptions.ConnectionClosed:
             print("Trade feed connection closed")
 
-async def demonstrate_basic_functionality():
+async def demonstrate_basic_functionality(client: MatchingEngineClient):
     """Demonstrate basic matching engine functionality."""
     print("=== GoQuant Matching Engine Demonstration ===\n")
     
-    client = MatchingEngineClient()
     symbol = "BTC-USDT"
     
     # 1. Check system health
     print("1. Checking system health...")
-    health_response = requests.get("http://localhost:8000/health")
-    print(f"Health Status: {health_response.json()}\n")
+    health_response = await client.get_health()
+    print(f"Health Status: {health_response}\n")
     
     # 2. Submit some limit orders to build the order book
     print("2. Building order book with limit orders...")
@@ -119,10 +187,6 @@ async def demonstrate_basic_functionality():
         ("BTC-USDT", "sell", "limit", "1.5", "53000.0"),
     ]
     
-    for order_data in sell_orders:
-        result = await client.submit_order(*order_data)
-        print(f"Sell Order: {order_data} -> {result['status']}")
-    
     # Add some buy orders
     buy_orders = [
         ("BTC-USDT", "buy", "limit", "1.0", "49000.0"),
@@ -130,22 +194,30 @@ async def demonstrate_basic_functionality():
         ("BTC-USDT", "buy", "limit", "1.5", "47000.0"),
     ]
     
-    for order_data in buy_orders:
-        result = await client.submit_order(*order_data)
-        print(f"Buy Order: {order_data} -> {result['status']}")
+    # None of these prices cross, so the orders can go in concurrently
+    semaphore = asyncio.Semaphore(8)
+    
+    async def submit(order_data):
+        async with semaphore:
+            return await client.submit_order(*order_data)
+    
+    resting_orders = sell_orders + buy_orders
+    results = await asyncio.gather(*(submit(order_data) for order_data in resting_orders))
+    for order_data, result in zip(resting_orders, results):
+        print(f"{order_data[1].capitalize()} Order: {order_data} -> {result['status']}")
     
     print()
     
     # 3. Display current order book
     print("3. Current order book:")
     order_book = await client.get_order_book(symbol, depth=5)
-    print(json.dumps(order_book, indent=2))
+    print(_pretty(order_book))
     print()
     
     # 4. Display best bid and offer
     print("4. Best Bid and Offer:")
     bbo = await client.get_best_bid_offer(symbol)
-    print(json.dumps(bbo, indent=2))
+    print(_pretty(bbo))
     print()
     
     # 5. Submit market orders to trigger matches
@@ -178,7 +250,7 @@ async def demonstrate_basic_functionality():
     # 8. Display updated order book
     print("8. Updated order book after matches:")
     order_book = await client.get_order_book(symbol, depth=5)
-    print(json.dumps(order_book, indent=2))
+    print(_pretty(order_book))
     print()
     
     # 9. Test order cancellation
@@ -194,19 +266,15 @@ async def demonstrate_basic_functionality():
         print(f"Cancellation result: {cancel_result}")
     print()
 
-async def demonstrate_websocket_streaming():
+async def demonstrate_websocket_streaming(client: MatchingEngineClient):
     """Demonstrate real-time WebSocket streaming."""
     print("=== WebSocket Streaming Demonstration ===\n")
     
-    client = MatchingEngineClient()
     symbol = "BTC-USDT"
     
-    # Start WebSocket listeners in background
-    market_data_task = asyncio.create_task(client.listen_market_data(symbol))
-    trades_task = asyncio.create_task(client.listen_trades(symbol))
-    
-    # Give WebSocket connections time to establish
-    await asyncio.sleep(1)
+    # Listeners normally start in main() with the feeds; start them here otherwise
+    client.start_listeners(symbol)
+    await asyncio.sleep(0)
     
     print("WebSocket connections established. Submitting orders to trigger updates...\n")
     
@@ -224,18 +292,13 @@ async def demonstrate_websocket_streaming():
         print(f"Result: {result['status']}")
         await asyncio.sleep(1)  # Wait between orders to see updates
     
-    print("\nWebSocket demonstration complete. Connections will remain open for 10 seconds...")
+    print("\nWebSocket demonstration complete. Waiting 10 seconds for remaining updates...")
     await asyncio.sleep(10)
-    
-    # Cancel background tasks
-    market_data_task.cancel()
-    trades_task.cancel()
 
-async def demonstrate_performance():
+async def demonstrate_performance(client: MatchingEngineClient):
     """Demonstrate system performance with bulk order submission."""
     print("=== Performance Demonstration ===\n")
     
-    client = MatchingEngineClient()
     symbol = "BTC-USDT"
     
     # Generate random orders
@@ -246,17 +309,14 @@ async def demonstrate_performance():
         quantity = str(round(random.uniform(0.1, 5.0), 3))
         price = str(round(random.uniform(45000, 55000), 2)) if order_type == "limit" else None
         
-        orders.append((symbol, side, order_type, quantity, price))
+        orders.append({"symbol": symbol, "side": side, "order_type": order_type, "quantity": quantity, "price": price})
     
     print(f"Submitting {len(orders)} orders for performance test...")
     
     start_time = asyncio.get_event_loop().time()
     
-    # Submit all orders
-    results = []
-    for order_data in orders:
-        result = await client.submit_order(*order_data)
-        results.append(result)
+    # Submit all orders in one request
+    results = await client.submit_orders_batch(orders)
     
     end_time = asyncio.get_event_loop().time()
     duration = end_time - start_time
@@ -279,15 +339,22 @@ async def main():
     """Main demonstration function."""
     print("Starting GoQuant Matching Engine Demonstration...\n")
     
+    client = MatchingEngineClient()
     try:
+        # Open both feeds once up front and print updates as they arrive,
+        # so each update shows up next to the step that caused it
+        symbol = "BTC-USDT"
+        await asyncio.gather(client.connect_market_data(symbol), client.connect_trades(symbol))
+        client.start_listeners(symbol)
+        
         # Basic functionality demonstration
-        await demonstrate_basic_functionality()
+        await demonstrate_basic_functionality(client)
         
         # WebSocket streaming demonstration
-        await demonstrate_websocket_streaming()
+        await demonstrate_websocket_streaming(client)
         
         # Performance demonstration
-        await demonstrate_performance()
+        await demonstrate_performance(client)
         
         print("Demonstration complete!")
         
@@ -295,6 +362,14 @@ async def main():
         print(f"Error during demonstration: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await client.close()
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        # uvloop has no Windows build; fall back to the stdlib loop
+        pass
     asyncio.run(main())
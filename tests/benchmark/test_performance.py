@@ -3,15 +3,24 @@ Performance benchmarks for the matching engine.
 """
 
 import pytest
+import pytest_asyncio
 import asyncio
+import sys
 import time
 from decimal import Decimal
-from random import uniform, choice
+from random import Random
+from statistics import quantiles
 
 from src.matching_engine.engine import MatchingEngine
 from src.models.order import Order, OrderSide, OrderType
 
-@pytest.fixture
+# Fixed seed so every run benchmarks the same order flow
+BENCHMARK_SEED = 42
+
+SIDES = (OrderSide.BUY, OrderSide.SELL)
+ORDER_TYPES = (OrderType.LIMIT, OrderType.MARKET, OrderType.IOC, OrderType.FOK)
+
+@pytest_asyncio.fixture
 async def matching_engine():
     """Create a matching engine instance for benchmarking."""
     engine = MatchingEngine()
@@ -19,28 +28,27 @@ async def matching_engine():
     yield engine
     await engine.shutdown()
 
-def generate_random_orders(count: int, symbol: str = "BTC-USDT") -> list[Order]:
-    """Generate random orders for benchmarking."""
-    orders = []
-    
-    for _ in range(count):
-        side = choice([OrderSide.BUY, OrderSide.SELL])
-        order_type = choice([OrderType.LIMIT, OrderType.MARKET, OrderType.IOC, OrderType.FOK])
-        
-        # Generate realistic price range
-        price = Decimal(str(round(uniform(45000, 55000), 2)))
-        quantity = Decimal(str(round(uniform(0.001, 10.0), 6)))
-        
-        order = Order(
+def generate_random_orders(count: int, symbol: str = "BTC-USDT", seed: int = BENCHMARK_SEED) -> list[Order]:
+    """Generate reproducible random orders for benchmarking, drawing all random fields up front."""
+    rng = Random(seed)
+    randrange = rng.randrange
+    sides = rng.choices(SIDES, k=count)
+    order_types = rng.choices(ORDER_TYPES, k=count)
+    # Realistic price range, drawn as whole 0.01 ticks and 0.000001 lots so
+    # each Decimal is built from an int instead of parsed from a string
+    prices = [Decimal(randrange(4500000, 5500001)).scaleb(-2) for _ in range(count)]
+    quantities = [Decimal(randrange(1000, 10000001)).scaleb(-6) for _ in range(count)]
+    
+    return [
+        Order(
             symbol=symbol,
             side=side,
             order_type=order_type,
             quantity=quantity,
             price=price if order_type == OrderType.LIMIT else None
         )
-        orders.append(order)
-    
-    return orders
+        for side, order_type, price, quantity in zip(sides, order_types, prices, quantities)
+    ]
 
 @pytest.mark.asyncio
 @pytest.mark.benchmark
@@ -49,11 +57,7 @@ async def test_order_submission_performance(matching_engine, benchmark):
     orders = generate_random_orders(1000)
     
     async def submit_orders():
-        results = []
-        for order in orders:
-            result = await matching_engine.submit_order(order)
-            results.append(result)
-        return results
+        return await asyncio.gather(*(matching_engine.submit_order(order) for order in orders))
     
     results = await benchmark(submit_orders)
     assert len(results) == 1000
@@ -62,36 +66,35 @@ async def test_order_submission_performance(matching_engine, benchmark):
 @pytest.mark.benchmark
 async def test_market_order_matching_performance(matching_engine, benchmark):
     """Benchmark market order matching performance."""
-    # Pre-populate order book with limit orders
+    limit_quantity = Decimal("1.0")
+    market_quantity = Decimal("0.1")
+    
+    # Pre-populate order book with limit orders, one at a time so the book is built in order
     limit_orders = []
     for i in range(100):
         order = Order(
             symbol="BTC-USDT",
             side=OrderSide.SELL if i % 2 == 0 else OrderSide.BUY,
             order_type=OrderType.LIMIT,
-            quantity=Decimal("1.0"),
+            quantity=limit_quantity,
             price=Decimal(str(50000 + i * 10))
         )
         limit_orders.append(order)
         await matching_engine.submit_order(order)
     
     # Generate market orders
-    market_orders = []
-    for _ in range(50):
-        order = Order(
+    market_orders = [
+        Order(
             symbol="BTC-USDT",
-            side=choice([OrderSide.BUY, OrderSide.SELL]),
+            side=side,
             order_type=OrderType.MARKET,
-            quantity=Decimal("0.1")
+            quantity=market_quantity
         )
-        market_orders.append(order)
+        for side in Random(BENCHMARK_SEED).choices(SIDES, k=50)
+    ]
     
     async def match_orders():
-        results = []
-        for order in market_orders:
-            result = await matching_engine.submit_order(order)
-            results.append(result)
-        return results
+        return await asyncio.gather(*(matching_engine.submit_order(order) for order in market_orders))
     
     results = await benchmark(match_orders)
     assert len(results) == 50
@@ -105,10 +108,13 @@ async def test_order_book_snapshot_performance(matching_engine, benchmark):
     for order in orders:
         await matching_engine.submit_order(order)
     
+    # The engine's snapshot read is a coroutine; time the book-side work it runs
+    order_book = matching_engine.order_books["BTC-USDT"]
+    
     def get_snapshots():
         snapshots = []
         for _ in range(100):
-            snapshot = matching_engine.get_order_book_snapshot("BTC-USDT", depth=10)
+            snapshot = order_book.get_order_book_snapshot(10).to_dict()
             snapshots.append(snapshot)
         return snapshots
     
@@ -117,16 +123,27 @@ async def test_order_book_snapshot_performance(matching_engine, benchmark):
 
 @pytest.mark.asyncio
 @pytest.mark.benchmark
-async def test_best_bid_offer_calculation_performance(matching_engine, benchmark):
-    """Benchmark best bid and offer calculation performance."""
+@pytest.mark.parametrize("cached", [True, False], ids=["warm", "cold"])
+async def test_best_bid_offer_calculation_performance(matching_engine, benchmark, cached):
+    """
+    Benchmark best bid and offer calculation performance.
+    
+    The warm variant serves every call from the book's cached BBO; the cold
+    variant drops the cache before each call, as a write to the top of the
+    book would, so every call rebuilds it.
+    """
     # Pre-populate order book
     orders = generate_random_orders(200)
     for order in orders:
         await matching_engine.submit_order(order)
     
+    order_book = matching_engine.order_books["BTC-USDT"]
+    
     def get_bbo():
         bbo_data = []
         for _ in range(1000):
+            if not cached:
+                order_book._invalidate_views()
             bbo = matching_engine.get_best_bid_offer("BTC-USDT")
             bbo_data.append(bbo)
         return bbo_data
@@ -139,15 +156,14 @@ async def test_throughput_measurement(matching_engine):
     """Measure orders per second throughput."""
     orders = generate_random_orders(1000)
     
-    start_time = time.time()
+    start_time = time.perf_counter_ns()
     
     # Submit all orders
-    for order in orders:
-        await matching_engine.submit_order(order)
+    await asyncio.gather(*(matching_engine.submit_order(order) for order in orders))
     
-    end_time = time.time()
-    duration = end_time - start_time
-    orders_per_second = len(orders) / duration
+    duration_ns = time.perf_counter_ns() - start_time
+    duration = duration_ns / 1e9  # Seconds, for reporting
+    orders_per_second = len(orders) * 1e9 / duration_ns
     
     print(f"Processed {len(orders)} orders in {duration:.2f} seconds")
     print(f"Throughput: {orders_per_second:.2f} orders/second")
@@ -159,23 +175,24 @@ async def test_throughput_measurement(matching_engine):
 async def test_latency_measurement(matching_engine):
     """Measure order processing latency."""
     orders = generate_random_orders(100)
-    latencies = []
+    latencies = [0] * len(orders)  # Nanoseconds, preallocated
     
-    for order in orders:
-        start_time = time.perf_counter()
+    for i, order in enumerate(orders):
+        start_time = time.perf_counter_ns()
         await matching_engine.submit_order(order)
-        end_time = time.perf_counter()
-        
-        latency = (end_time - start_time) * 1000  # Convert to milliseconds
-        latencies.append(latency)
+        latencies[i] = time.perf_counter_ns() - start_time
     
-    avg_latency = sum(latencies) / len(latencies)
-    max_latency = max(latencies)
-    min_latency = min(latencies)
+    # Convert to milliseconds only for reporting
+    avg_latency = sum(latencies) / len(latencies) / 1e6
+    max_latency = max(latencies) / 1e6
+    min_latency = min(latencies) / 1e6
+    percentiles = quantiles(latencies, n=100)
+    p50, p95, p99 = (percentiles[p - 1] / 1e6 for p in (50, 95, 99))
     
-    print(f"Average latency: {avg_latency:.2f} ms")
-    print(f"Max latency: {max_latency:.2f} ms")
-    print(f"Min latency: {min_latency:.2f} ms")
+    print(f"Average latency: {avg_latency:.3f} ms")
+    print(f"Max latency: {max_latency:.3f} ms")
+    print(f"Min latency: {min_latency:.3f} ms")
+    print(f"p50/p95/p99 latency: {p50:.3f} / {p95:.3f} / {p99:.3f} ms")
     
     # Assert reasonable latency
     assert avg_latency < 10, f"Average latency {avg_latency:.2f}ms too high"
@@ -184,18 +201,17 @@ async def test_latency_measurement(matching_engine):
 @pytest.mark.asyncio
 async def test_memory_usage(matching_engine):
     """Test memory usage with large number of orders."""
-    import psutil
-    import os
+    resource = pytest.importorskip("resource")  # Unix only
+    # Peak RSS so far; ru_maxrss is in bytes on macOS and KB elsewhere
+    rss_unit = 1024 * 1024 if sys.platform == "darwin" else 1024
     
-    process = psutil.Process(os.getpid())
-    initial_memory = process.memory_info().rss / 1024 / 1024  # MB
+    initial_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / rss_unit  # MB
     
     # Add many orders
     orders = generate_random_orders(10000)
-    for order in orders:
-        await matching_engine.submit_order(order)
+    await asyncio.gather(*(matching_engine.submit_order(order) for order in orders))
     
-    final_memory = process.memory_info().rss / 1024 / 1024  # MB
+    final_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / rss_unit  # MB
     memory_increase = final_memory - initial_memory
     
     print(f"Initial memory: {initial_memory:.2f} MB")
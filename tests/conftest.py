@@ -0,0 +1,20 @@
+"""
+Shared pytest fixtures.
+"""
+
+import asyncio
+
+import pytest
+
+try:
+    import uvloop
+except ImportError:
+    # uvloop has no Windows build; fall back to the stdlib loop
+    uvloop = None
+
+@pytest.fixture
+def event_loop():
+    """Run each async test on a fresh uvloop loop when uvloop is available."""
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    yield loop
+    loop.close()
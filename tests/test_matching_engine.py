@@ -3,14 +3,26 @@ Unit tests for the matching engine core functionality.
 """
 
 import pytest
+import pytest_asyncio
 import asyncio
+import threading
 from decimal import Decimal
 from datetime import datetime
 
+from src.api.market_data_api import ConnectionManager
 from src.matching_engine.engine import MatchingEngine
-from src.models.order import Order, OrderSide, OrderType, OrderStatus
+from src.matching_engine.order_book import OrderBook
+from src.matching_engine.shard import ShardWorker, ThreadedShardWorker
+from src.models.order import Order, OrderSide, OrderType, OrderStatus, to_fixed, format_fixed
 
-@pytest.fixture
+# Quantities and prices shared by many tests, parsed once
+D_ONE = Decimal("1.0")
+D_TWO = Decimal("2.0")
+D_HALF = Decimal("0.5")
+D_49K = Decimal("49000.0")
+D_50K = Decimal("50000.0")
+
+@pytest_asyncio.fixture
 async def matching_engine():
     """Create a matching engine instance for testing."""
     engine = MatchingEngine()
@@ -26,8 +38,8 @@ async def test_market_order_execution(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     result = await matching_engine.submit_order(limit_order)
@@ -38,7 +50,7 @@ async def test_market_order_execution(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.MARKET,
-        quantity=Decimal("0.5")
+        quantity=D_HALF
     )
     
     result = await matching_engine.submit_order(market_order)
@@ -54,8 +66,8 @@ async def test_limit_order_resting(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("49000.0")
+        quantity=D_ONE,
+        price=D_49K
     )
     
     result = await matching_engine.submit_order(limit_order)
@@ -66,6 +78,38 @@ async def test_limit_order_resting(matching_engine):
     assert order is not None
     assert order.status == OrderStatus.PENDING
 
+@pytest.mark.asyncio
+async def test_crossing_limit_order_execution(matching_engine):
+    """Test that a limit order crossing the spread trades and rests only its remainder."""
+    sell_order = Order(
+        symbol="BTC-USDT",
+        side=OrderSide.SELL,
+        order_type=OrderType.LIMIT,
+        quantity=D_ONE,
+        price=D_50K
+    )
+    assert (await matching_engine.submit_order(sell_order))["status"] == "pending"
+    
+    buy_order = Order(
+        symbol="BTC-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.LIMIT,
+        quantity=D_TWO,
+        price=Decimal("50010.0")
+    )
+    result = await matching_engine.submit_order(buy_order)
+    
+    # Trades at the resting price; the unfilled remainder becomes the best bid
+    assert result["status"] == "partially_filled"
+    assert len(result["fills"]) == 1
+    assert result["fills"][0]["price"] == "50000.0"
+    assert sell_order.status == OrderStatus.FILLED
+    
+    bbo = matching_engine.get_best_bid_offer("BTC-USDT")
+    assert bbo["best_ask"] is None
+    assert bbo["best_bid"]["price"] == "50010.0"
+    assert bbo["best_bid"]["quantity"] == "1.0"
+
 @pytest.mark.asyncio
 async def test_price_time_priority(matching_engine):
     """Test price-time priority matching."""
@@ -74,8 +118,8 @@ async def test_price_time_priority(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     result1 = await matching_engine.submit_order(order1)
@@ -86,8 +130,8 @@ async def test_price_time_priority(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     result2 = await matching_engine.submit_order(order2)
@@ -98,7 +142,7 @@ async def test_price_time_priority(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.MARKET,
-        quantity=Decimal("0.5")
+        quantity=D_HALF
     )
     
     result = await matching_engine.submit_order(market_order)
@@ -113,8 +157,8 @@ async def test_ioc_order_execution(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     await matching_engine.submit_order(limit_order)
@@ -124,8 +168,8 @@ async def test_ioc_order_execution(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.IOC,
-        quantity=Decimal("0.5"),
-        price=Decimal("50000.0")
+        quantity=D_HALF,
+        price=D_50K
     )
     
     result = await matching_engine.submit_order(ioc_order)
@@ -140,8 +184,8 @@ async def test_ioc_order_cancellation(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.IOC,
-        quantity=Decimal("1.0"),
-        price=Decimal("49000.0")  # Lower than any sell orders
+        quantity=D_ONE,
+        price=D_49K  # Lower than any sell orders
     )
     
     result = await matching_engine.submit_order(ioc_order)
@@ -155,8 +199,8 @@ async def test_fok_order_execution(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     await matching_engine.submit_order(limit_order)
@@ -166,8 +210,8 @@ async def test_fok_order_execution(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.FOK,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     result = await matching_engine.submit_order(fok_order)
@@ -182,8 +226,8 @@ async def test_fok_order_cancellation(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("0.5"),
-        price=Decimal("50000.0")
+        quantity=D_HALF,
+        price=D_50K
     )
     
     await matching_engine.submit_order(limit_order)
@@ -193,8 +237,8 @@ async def test_fok_order_cancellation(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.FOK,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     result = await matching_engine.submit_order(fok_order)
@@ -208,8 +252,8 @@ async def test_order_cancellation(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("49000.0")
+        quantity=D_ONE,
+        price=D_49K
     )
     
     result = await matching_engine.submit_order(limit_order)
@@ -231,8 +275,8 @@ async def test_best_bid_offer_calculation(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("49000.0")
+        quantity=D_ONE,
+        price=D_49K
     )
     
     await matching_engine.submit_order(buy_order)
@@ -242,8 +286,8 @@ async def test_best_bid_offer_calculation(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     await matching_engine.submit_order(sell_order)
@@ -259,17 +303,17 @@ async def test_order_book_snapshot(matching_engine):
     """Test order book snapshot generation."""
     # Add multiple orders
     orders = [
-        Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=Decimal("1.0"), price=Decimal("49000.0")),
-        Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=Decimal("2.0"), price=Decimal("48000.0")),
-        Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT, quantity=Decimal("1.0"), price=Decimal("50000.0")),
-        Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT, quantity=Decimal("2.0"), price=Decimal("51000.0")),
+        Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=D_ONE, price=D_49K),
+        Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=D_TWO, price=Decimal("48000.0")),
+        Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT, quantity=D_ONE, price=D_50K),
+        Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT, quantity=D_TWO, price=Decimal("51000.0")),
     ]
     
     for order in orders:
         await matching_engine.submit_order(order)
     
     # Get snapshot
-    snapshot = matching_engine.get_order_book_snapshot("BTC-USDT", depth=2)
+    snapshot = await matching_engine.get_order_book_snapshot("BTC-USDT", depth=2)
     assert snapshot is not None
     assert len(snapshot["bids"]) == 2
     assert len(snapshot["asks"]) == 2
@@ -277,6 +321,10 @@ async def test_order_book_snapshot(matching_engine):
     # Check ordering (bids descending, asks ascending)
     assert Decimal(snapshot["bids"][0]["price"]) > Decimal(snapshot["bids"][1]["price"])
     assert Decimal(snapshot["asks"][0]["price"]) < Decimal(snapshot["asks"][1]["price"])
+    
+    # A negative depth is an empty snapshot, not an error
+    snapshot = await matching_engine.get_order_book_snapshot("BTC-USDT", depth=-1)
+    assert snapshot["bids"] == () and snapshot["asks"] == ()
 
 @pytest.mark.asyncio
 async def test_invalid_order_handling(matching_engine):
@@ -287,7 +335,7 @@ async def test_invalid_order_handling(matching_engine):
         side=OrderSide.BUY,
         order_type=OrderType.LIMIT,
         quantity=Decimal("-1.0"),
-        price=Decimal("50000.0")
+        price=D_50K
     )
     
     result = await matching_engine.submit_order(invalid_order)
@@ -298,8 +346,8 @@ async def test_invalid_order_handling(matching_engine):
         symbol="INVALID-SYMBOL",
         side=OrderSide.BUY,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     result = await matching_engine.submit_order(invalid_order)
@@ -313,8 +361,8 @@ async def test_partial_fill_handling(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.SELL,
         order_type=OrderType.LIMIT,
-        quantity=Decimal("1.0"),
-        price=Decimal("50000.0")
+        quantity=D_ONE,
+        price=D_50K
     )
     
     await matching_engine.submit_order(sell_order)
@@ -324,10 +372,365 @@ async def test_partial_fill_handling(matching_engine):
         symbol="BTC-USDT",
         side=OrderSide.BUY,
         order_type=OrderType.MARKET,
-        quantity=Decimal("2.0")
+        quantity=D_TWO
     )
     
     result = await matching_engine.submit_order(buy_order)
     assert result["status"] == "partially_filled"
     assert result["filled_quantity"] == "1.0"
     assert result["remaining_quantity"] == "1.0"
+
+@pytest.mark.asyncio
+async def test_resting_order_indexes(matching_engine):
+    """Test per-symbol and per-user indexes of resting orders."""
+    sell_order = Order(
+        symbol="BTC-USDT",
+        side=OrderSide.SELL,
+        order_type=OrderType.LIMIT,
+        quantity=D_ONE,
+        price=D_50K,
+        user_id="alice"
+    )
+    other_sell_order = Order(
+        symbol="BTC-USDT",
+        side=OrderSide.SELL,
+        order_type=OrderType.LIMIT,
+        quantity=D_ONE,
+        price=Decimal("51000.0"),
+        user_id="alice"
+    )
+    
+    await matching_engine.submit_order(sell_order)
+    await matching_engine.submit_order(other_sell_order)
+    assert matching_engine.orders_by_user["alice"] == {sell_order.order_id, other_sell_order.order_id}
+    assert matching_engine.orders_by_symbol["BTC-USDT"] == {sell_order.order_id, other_sell_order.order_id}
+    assert matching_engine.open_order_count == 2
+    
+    # Fully filled resting orders leave the indexes
+    market_order = Order(
+        symbol="BTC-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.MARKET,
+        quantity=D_ONE
+    )
+    await matching_engine.submit_order(market_order)
+    assert matching_engine.orders_by_user["alice"] == {other_sell_order.order_id}
+    assert matching_engine.open_order_count == 1
+    assert matching_engine.get_active_orders_for_symbol("BTC-USDT") == [other_sell_order]
+    
+    # So do cancelled ones
+    await matching_engine.cancel_order(other_sell_order.order_id)
+    assert "alice" not in matching_engine.orders_by_user
+    assert matching_engine.orders_by_symbol["BTC-USDT"] == set()
+    assert matching_engine.open_order_count == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_orders_across_symbols(matching_engine):
+    """Test that orders submitted concurrently are sequenced per symbol."""
+    orders = [
+        Order(
+            symbol=symbol,
+            side=OrderSide.SELL,
+            order_type=OrderType.LIMIT,
+            quantity=D_ONE,
+            price=Decimal("100.0")
+        )
+        for symbol in ("BTC-USDT", "ETH-USDT")
+        for _ in range(5)
+    ]
+    
+    results = await asyncio.gather(*(matching_engine.submit_order(order) for order in orders))
+    assert all(result["status"] == "pending" for result in results)
+    assert len(matching_engine.orders_by_symbol["BTC-USDT"]) == 5
+    assert len(matching_engine.orders_by_symbol["ETH-USDT"]) == 5
+    
+    # Cancels go through the same per-symbol sequence
+    results = await asyncio.gather(*(matching_engine.cancel_order(order.order_id) for order in orders))
+    assert all(result["status"] == "cancelled" for result in results)
+    assert matching_engine.open_order_count == 0
+
+def test_fixed_point_conversion():
+    """Test conversion between Decimal values and fixed-point units."""
+    assert to_fixed(Decimal("0.00000001")) == 1
+    assert to_fixed(Decimal("1.5")) == 150_000_000
+    assert format_fixed(150_000_000) == "1.5"
+    assert format_fixed(to_fixed(Decimal("50000"))) == "50000.0"
+    assert format_fixed(1) == "0.00000001"
+    
+    # Values finer than the book precision are rejected rather than truncated
+    with pytest.raises(ValueError):
+        to_fixed(Decimal("0.000000001"))
+    
+    order = Order(
+        symbol="BTC-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.LIMIT,
+        quantity=Decimal("0.3"),
+        price=Decimal("50000.25")
+    )
+    assert order.quantity_lots == order.remaining_lots == 30_000_000
+    assert order.price_ticks == 5_000_025_000_000
+    assert order.remaining_quantity == Decimal("0.3")
+
+def test_fixed_point_rejects_extreme_exponents():
+    """Test that huge and tiny exponents are rejected without expanding them."""
+    for value in ("1e30000000", "-1e30000000", "1e-30000000", "1.000000000000e-20"):
+        with pytest.raises(ValueError):
+            to_fixed(Decimal(value))
+    
+    # Trailing zeros beyond the book precision are fine
+    assert to_fixed(Decimal("1.000000000000")) == 100_000_000
+    assert to_fixed(Decimal("0E-30000000")) == 0
+
+@pytest.mark.asyncio
+async def test_trade_callbacks_batched_per_match(matching_engine):
+    """Test that a sweeping order delivers all of its fills in one callback."""
+    batches = []
+    matching_engine.add_trade_callback(batches.append)
+    
+    for price in ("50000.0", "50100.0"):
+        await matching_engine.submit_order(Order(
+            symbol="BTC-USDT",
+            side=OrderSide.SELL,
+            order_type=OrderType.LIMIT,
+            quantity=D_ONE,
+            price=Decimal(price)
+        ))
+    
+    result = await matching_engine.submit_order(Order(
+        symbol="BTC-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.IOC,
+        quantity=D_TWO,
+        price=Decimal("50100.0")
+    ))
+    assert result["status"] == "filled"
+    assert len(batches) == 1
+    assert [trade.price_ticks for trade in batches[0]] == [5_000_000_000_000, 5_010_000_000_000]
+    # Trade IDs are sequential within the symbol's shard
+    assert [trade.trade_id for trade in batches[0]] == ["1", "2"]
+
+@pytest.mark.asyncio
+async def test_callback_errors_are_isolated(matching_engine):
+    """Test that a failing callback does not stop the others or the order."""
+    received = []
+    
+    def failing_callback(symbol, data):
+        raise RuntimeError("subscriber failed")
+    
+    async def async_callback(symbol, data):
+        received.append(symbol)
+    
+    matching_engine.add_market_data_callback(failing_callback)
+    matching_engine.add_market_data_callback(async_callback)
+    
+    result = await matching_engine.submit_order(Order(
+        symbol="ETH-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.LIMIT,
+        quantity=D_ONE,
+        price=Decimal("3000.0")
+    ))
+    assert result["status"] == "pending"
+    assert received == ["ETH-USDT"]
+
+@pytest.mark.asyncio
+async def test_market_data_published_only_on_top_of_book_change(matching_engine):
+    """Test that an unchanged BBO is not published twice."""
+    updates = []
+    matching_engine.add_market_data_callback(lambda symbol, data: updates.append(data))
+    
+    await matching_engine.submit_order(Order(
+        symbol="ETH-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.LIMIT,
+        quantity=D_ONE,
+        price=Decimal("3000.0")
+    ))
+    await matching_engine._notify_market_data_update(matching_engine.order_books["ETH-USDT"].get_best_bid_offer())
+    
+    assert len(updates) == 1
+    assert updates[0]["best_bid"]["price"] == "3000.0"
+    # The published dictionary is reused for reads until the book changes, so it is read-only
+    assert matching_engine.get_best_bid_offer("ETH-USDT") is updates[0]
+    with pytest.raises(TypeError):
+        updates[0]["best_bid"] = None
+    with pytest.raises(TypeError):
+        updates[0]["best_bid"]["price"] = "0"
+
+@pytest.mark.asyncio
+async def test_submit_orders_batch(matching_engine):
+    """Test that a burst of orders keeps per-symbol order and publishes once per symbol."""
+    batches = []
+    updates = []
+    matching_engine.add_trade_callback(batches.append)
+    matching_engine.add_market_data_callback(lambda symbol, data: updates.append(symbol))
+    
+    results = await matching_engine.submit_orders([
+        Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT,
+              quantity=D_ONE, price=D_50K),
+        Order(symbol="ETH-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT,
+              quantity=D_ONE, price=Decimal("3000.0")),
+        Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.MARKET,
+              quantity=Decimal("0.4")),
+        Order(symbol="INVALID-SYMBOL", side=OrderSide.BUY, order_type=OrderType.MARKET,
+              quantity=D_ONE),
+    ])
+    
+    assert [result["status"] for result in results] == ["pending", "pending", "filled", "error"]
+    assert len(batches) == 1 and len(batches[0]) == 1
+    assert sorted(updates) == ["BTC-USDT", "ETH-USDT"]
+
+def test_emptied_price_levels_are_reused():
+    """Test that a price level emptied by a removal is recycled for the next new price."""
+    book = OrderBook("BTC-USDT")
+    first = Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT,
+                  quantity=D_ONE, price=D_50K)
+    second = Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT,
+                   quantity=D_TWO, price=Decimal("50100.0"))
+    
+    book.add_order(first)
+    level = book.bids
+    book.remove_order(first)
+    assert book.bids is None
+    
+    book.add_order(second)
+    assert book.asks is level
+    assert list(level) == [second]
+    assert book.get_total_quantity_at_price(second.price_ticks) == second.quantity_lots
+
+def test_best_bid_offer_survives_deeper_changes():
+    """Test that changes below the best levels keep the cached BBO."""
+    book = OrderBook("BTC-USDT")
+    best, deeper = (
+        Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT,
+              quantity=D_ONE, price=Decimal(price))
+        for price in ("50000.0", "49900.0")
+    )
+    book.add_order(best)
+    bbo = book.get_best_bid_offer()
+    
+    book.add_order(deeper)
+    book.remove_order(deeper)
+    assert book.get_best_bid_offer() is bbo
+    
+    book.remove_order(best)
+    assert book.get_best_bid_offer().best_bid is None
+
+def test_snapshot_cache_is_bounded():
+    """Test that only the standard snapshot depths are cached."""
+    book = OrderBook("BTC-USDT")
+    book.add_order(Order(symbol="BTC-USDT", side=OrderSide.BUY, order_type=OrderType.LIMIT,
+                         quantity=D_ONE, price=D_50K))
+    
+    assert book.get_order_book_snapshot(10) is book.get_order_book_snapshot(10)
+    for depth in range(1, 200):
+        book.get_order_book_snapshot(depth)
+    assert set(book._snapshot_cache) <= {10, 20, 50}
+    assert len(book.get_order_book_snapshot(10**9).bids) == 1
+
+def test_marketable_orders_iterate_lazily():
+    """Test that marketable orders stream in priority order while filled ones are removed."""
+    book = OrderBook("BTC-USDT")
+    asks = [
+        Order(symbol="BTC-USDT", side=OrderSide.SELL, order_type=OrderType.LIMIT,
+              quantity=D_ONE, price=Decimal(price))
+        for price in ("50000.0", "50000.0", "50100.0", "50200.0")
+    ]
+    for ask in asks:
+        book.add_order(ask)
+    
+    marketable = book.iter_marketable_orders(OrderSide.BUY, asks[2].price_ticks)
+    for expected in asks[:3]:
+        resting_order = next(marketable)
+        assert resting_order is expected
+        book.remove_order(resting_order)
+    
+    # The level above max_price is never reached
+    assert next(marketable, None) is None
+    assert book.asks.price == asks[3].price_ticks
+    assert book.get_marketable_orders(OrderSide.BUY, asks[3].price_ticks) == [asks[3]]
+
+@pytest.mark.asyncio
+async def test_threaded_shard_worker():
+    """Test that a threaded shard runs commands off the loop and publishes on it in order."""
+    published = []
+    
+    async def publish(fills, bbo):
+        # Yield so that unordered publishing would interleave
+        await asyncio.sleep(0)
+        published.append((threading.get_ident(), fills, bbo))
+    
+    shard = ThreadedShardWorker("BTC-USDT", OrderBook("BTC-USDT"), publish)
+    shard.start()
+    try:
+        result = await shard.submit(lambda: (threading.get_ident(), [], True))
+        await asyncio.gather(*(shard.submit(lambda i=i: (i, [i], False)) for i in range(20)))
+        snapshot = await shard.read(shard.order_book.get_order_book_snapshot, 10)
+    finally:
+        await shard.stop()
+    
+    assert result != threading.get_ident()
+    assert published[0] == (threading.get_ident(), [], shard.bbo)
+    assert [fills for _, fills, _ in published[1:]] == [[i] for i in range(20)]
+    assert snapshot.bids == [] and snapshot.asks == []
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("worker_class", [ShardWorker, ThreadedShardWorker])
+async def test_shard_survives_publish_errors(worker_class):
+    """Test that a failing publisher neither loses results nor stops the shard."""
+    async def publish(fills, bbo):
+        raise RuntimeError("publish failed")
+    
+    shard = worker_class("BTC-USDT", OrderBook("BTC-USDT"), publish)
+    shard.start()
+    try:
+        first = await asyncio.wait_for(shard.submit(lambda: ("first", [], True)), timeout=5)
+        second = await asyncio.wait_for(shard.submit(lambda: ("second", [], True)), timeout=5)
+    finally:
+        await shard.stop()
+    
+    assert (first, second) == ("first", "second")
+
+@pytest.mark.asyncio
+async def test_best_bid_offer_tracks_partial_fills(matching_engine):
+    """Test that cached book views reflect partial fills of resting orders."""
+    await matching_engine.submit_order(Order(
+        symbol="BTC-USDT",
+        side=OrderSide.SELL,
+        order_type=OrderType.LIMIT,
+        quantity=D_TWO,
+        price=D_50K
+    ))
+    order_book = matching_engine.order_books["BTC-USDT"]
+    assert order_book.get_best_bid_offer() is order_book.get_best_bid_offer()
+    
+    await matching_engine.submit_order(Order(
+        symbol="BTC-USDT",
+        side=OrderSide.BUY,
+        order_type=OrderType.MARKET,
+        quantity=D_HALF
+    ))
+    
+    bbo = matching_engine.get_best_bid_offer("BTC-USDT")
+    assert bbo["best_ask"]["quantity"] == "1.5"
+    snapshot = await matching_engine.get_order_book_snapshot("BTC-USDT")
+    assert snapshot["asks"][0]["quantity"] == "1.5"
+
+@pytest.mark.asyncio
+async def test_connection_manager_close_cancels_tasks():
+    """Test that closing the connection manager leaves no pending tasks behind."""
+    class FakeWebSocket:
+        async def accept(self):
+            pass
+        
+        async def send_text(self, frame):
+            pass
+    
+    manager = ConnectionManager()
+    await manager.connect_market_data(FakeWebSocket(), "BTC-USDT")
+    manager.broadcast_market_data("BTC-USDT", {"best_bid": None})
+    tasks = [manager._flush_task] + [subscriber.writer for subscriber in manager._subscribers.values()]
+    
+    await manager.close()
+    assert all(task.done() for task in tasks)